@@ -1,20 +1,184 @@
 import os
 import glob 
+import numpy as np
 import pandas as pd
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, g, has_request_context, Response
+from flask import stream_with_context
+from flask import before_render_template, template_rendered
 from datetime import datetime
 import openpyxl
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import MultiDict
 import locale
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import json
 import plotly
+import threading
+import contextlib
+import errno
+import types
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import tempfile
+import sqlite3
+import multiprocessing
+import uuid
+import base64
+import time
+import click
+
+# pyarrow opsional: tanpa pyarrow, data selalu dibaca langsung dari Excel
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+# Lock file antar proses: fcntl di Linux/macOS, msvcrt di Windows
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
 
 # --- Inisialisasi & Konfigurasi ---
 app = Flask(__name__)
 app.secret_key = "denso_secret_key_final_version"
 app.config['UPLOAD_FOLDER'] = os.path.dirname(os.path.abspath(__file__))
+# Jumlah entri journal sebelum file Excel tahunan dipadatkan (ditulis ulang) di background
+app.config['JOURNAL_COMPACT_THRESHOLD'] = 50
+# Journal juga dipadatkan setelah sekian detik tanpa penulisan baru, dan sekali saat proses
+# mulai melayani request (journal sisa proses sebelumnya). None: hanya berdasarkan jumlah entri.
+app.config['JOURNAL_COMPACT_IDLE_SECONDS'] = 300
+# Batas memori cache JSON grafik per supplier (byte)
+app.config['CHART_CACHE_MAX_BYTES'] = 64 * 1024 * 1024
+# Jumlah worker process untuk merge upload per tahun
+app.config['UPLOAD_MERGE_WORKERS'] = min(4, os.cpu_count() or 1)
+# Jumlah worker thread untuk job background (upload diproses satu per satu)
+app.config['JOB_WORKERS'] = 1
+# Storage engine: 'excel' (file data_YYYY.xlsx) atau 'sqlite' (data.sqlite3 di folder data).
+# Dibaca dari environment agar worker upload (proses terpisah) memakai engine yang sama.
+app.config['STORAGE_ENGINE'] = os.environ.get('STORAGE_ENGINE', 'excel')
+# Ukuran halaman default dan maksimum untuk API baris supplier
+app.config['API_PAGE_SIZE'] = 50
+app.config['API_MAX_PAGE_SIZE'] = 500
+# Batas memori cache agregat leaderboard per (versi data, periode) (byte)
+app.config['LEADERBOARD_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+# Tambahkan header Server-Timing (durasi per tahap) ke setiap respons
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '') == '1'
+
+# --- Instrumentasi & Metrics ---
+# Timer per tahap (_timed), counter (_count) dan statistik cache dikumpulkan di
+# memori proses ini lalu ditampilkan di /metrics (format teks Prometheus).
+# Durasi tahap selama satu request juga disimpan di flask.g untuk Server-Timing.
+_METRICS_LOCK = threading.Lock()
+_STAGE_TIMINGS = {}    # tahap -> [jumlah panggilan, total detik]
+_REQUEST_TIMINGS = {}  # endpoint -> [jumlah request, total detik]
+_COUNTERS = {}         # (nama, label) -> nilai
+_CACHE_STATS = {}      # nama cache -> [hit, miss]
+
+def _record_stage(stage, elapsed):
+    with _METRICS_LOCK:
+        entry = _STAGE_TIMINGS.setdefault(stage, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[stage] = timings.get(stage, 0.0) + elapsed
+
+@contextlib.contextmanager
+def _timed(stage):
+    """Mengukur durasi satu tahap (untuk /metrics dan Server-Timing)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_stage(stage, time.perf_counter() - start)
+
+def _count(name, value=1, **labels):
+    """Menambah counter (mis. byte/baris yang dibaca per sumber)."""
+    key = (name, tuple(sorted(labels.items())))
+    with _METRICS_LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + value
+
+def _count_cache(cache, hit):
+    with _METRICS_LOCK:
+        _CACHE_STATS.setdefault(cache, [0, 0])[0 if hit else 1] += 1
+
+def _count_read(source, rows, nbytes):
+    _count('rows_read_total', rows, source=source)
+    _count('bytes_read_total', nbytes, source=source)
+
+def _metric_labels(labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}' if labels else ''
+
+def render_metrics():
+    """Semua metrics proses ini dalam format teks Prometheus."""
+    with _METRICS_LOCK:
+        stages = sorted((stage, list(entry)) for stage, entry in _STAGE_TIMINGS.items())
+        requests_ = sorted((endpoint, list(entry)) for endpoint, entry in _REQUEST_TIMINGS.items())
+        counters = sorted(_COUNTERS.items())
+        caches = {name: list(stats) for name, stats in _CACHE_STATS.items()}
+    # Cache LRU menghitung hit/miss-nya sendiri
+    for name, cache in (('chart', _CHART_CACHE), ('leaderboard', _LEADERBOARD_CACHE)):
+        if cache is not None:
+            caches[name] = [cache.hits, cache.misses]
+
+    lines = ['# HELP dashboard_stage_seconds Time spent in instrumented stages.',
+             '# TYPE dashboard_stage_seconds summary']
+    for stage, (count, total) in stages:
+        lines.append(f'dashboard_stage_seconds_count{{stage="{stage}"}} {count}')
+        lines.append(f'dashboard_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+    lines += ['# HELP dashboard_request_seconds Request latency per endpoint.',
+              '# TYPE dashboard_request_seconds summary']
+    for endpoint, (count, total) in requests_:
+        lines.append(f'dashboard_request_seconds_count{{endpoint="{endpoint}"}} {count}')
+        lines.append(f'dashboard_request_seconds_sum{{endpoint="{endpoint}"}} {total:.6f}')
+    declared = set()
+    for (name, labels), value in counters:
+        if name not in declared:
+            declared.add(name)
+            lines.append(f'# TYPE dashboard_{name} counter')
+        lines.append(f'dashboard_{name}{_metric_labels(labels)} {value}')
+    lines += ['# TYPE dashboard_cache_hits_total counter', '# TYPE dashboard_cache_misses_total counter',
+              '# TYPE dashboard_cache_hit_ratio gauge']
+    for name, (hits, misses) in sorted(caches.items()):
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        lines.append(f'dashboard_cache_hits_total{{cache="{name}"}} {hits}')
+        lines.append(f'dashboard_cache_misses_total{{cache="{name}"}} {misses}')
+        lines.append(f'dashboard_cache_hit_ratio{{cache="{name}"}} {ratio:.4f}')
+    return '\n'.join(lines) + '\n'
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_request_timing(response):
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.endpoint or 'unknown'
+    with _METRICS_LOCK:
+        entry = _REQUEST_TIMINGS.setdefault(endpoint, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+    _count('http_responses_total', endpoint=endpoint, status=response.status_code)
+    if app.config['SERVER_TIMING']:
+        timings = dict(g.get('stage_timings', {}), total=elapsed)
+        response.headers['Server-Timing'] = ', '.join(f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in timings.items())
+    return response
+
+@before_render_template.connect_via(app)
+def _start_render_timer(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _record_render_timing(sender, template, context, **extra):
+    start = g.pop('render_start', None)
+    if start is not None:
+        _record_stage('render', time.perf_counter() - start)
 
 # --- Mengatur Locale ke Bahasa Inggris ---
 try:
@@ -31,74 +195,1860 @@ def get_data_file_path(year):
     os.makedirs(DATA_FOLDER_PATH, exist_ok=True)
     return os.path.join(DATA_FOLDER_PATH, file_name)
 
-def load_data(file_path):
-    """Memuat data dari SATU path file Excel yang spesifik."""
+def _year_from_file_path(file_path):
+    """Mengambil TAHUN dari nama file data_YYYY.xlsx."""
+    return int(os.path.splitext(os.path.basename(file_path))[0].split('_', 1)[1])
+
+# --- Row ID ---
+# row_id = TAHUN * ROW_ID_YEAR_FACTOR + hash(SUPPLIER NAME, CLOSING MONTH, urutan duplikat).
+# Hash dihitung secara vektor dengan hash_pandas_object (deterministik, tidak
+# terpengaruh hash randomization), jadi ID sama di semua proses dan setiap load.
+# Tahun di dalam ID menunjuk langsung ke file data_YYYY.xlsx pemiliknya.
+# Bentrokan hash diselesaikan dengan linear probing (lihat _assign_row_ids).
+ROW_ID_YEAR_FACTOR = 10**12
+
+def year_from_row_id(row_id):
+    """TAHUN file pemilik sebuah row_id."""
+    return int(row_id) // ROW_ID_YEAR_FACTOR
+
+def _row_id_keys(df):
+    """Kunci grup row_id per baris: SUPPLIER NAME dan tanggal CLOSING MONTH ('YYYY-MM-DD', '' jika kosong)."""
+    months = pd.to_datetime(df['CLOSING MONTH'], errors='coerce', cache=False).dt.strftime('%Y-%m-%d').fillna('')
+    names = df['SUPPLIER NAME'].astype(str)
+    return pd.DataFrame({'name': names.to_numpy(), 'month': months.to_numpy()})
+
+def _group_keys(df, positions):
+    """Kunci grup row_id (nama, tanggal) untuk baris-baris di posisi positions."""
+    return list(_row_id_keys(df.iloc[positions]).itertuples(index=False, name=None))
+
+def _row_id_hashes(df):
+    """(kunci nama/tanggal/urutan duplikat, row_id tanpa probing) untuk setiap baris df."""
+    key = _row_id_keys(df)
+    key['occurrence'] = key.groupby(['name', 'month']).cumcount()
+    hashes = pd.util.hash_pandas_object(key, index=False).to_numpy()
+    return key, (hashes % ROW_ID_YEAR_FACTOR).astype('int64')
+
+def _next_row_id(row_ids):
+    """row_id berikutnya dalam tahun yang sama (berputar di akhir rentang tahun)."""
+    row_ids = np.asarray(row_ids, dtype='int64')
+    years = row_ids // ROW_ID_YEAR_FACTOR
+    return years * ROW_ID_YEAR_FACTOR + (row_ids % ROW_ID_YEAR_FACTOR + 1) % ROW_ID_YEAR_FACTOR
+
+def _assign_row_ids(df, year):
+    """Mengisi kolom row_id yang stabil dan unik untuk semua baris df (in place).
+
+    Jika dua kunci mendapat hash yang sama, kunci diurutkan menurut (hash, nama,
+    tanggal, urutan duplikat) dan masing-masing mengambil nomor kosong pertama
+    mulai dari hash-nya, sehingga hasilnya tetap deterministik.
+    """
+    if df.empty:
+        df['row_id'] = pd.Series(dtype='int64')
+        return df
+    key, row_ids = _row_id_hashes(df)
+    collisions = len(row_ids) - len(np.unique(row_ids))
+    if collisions:
+        _count('row_id_collisions_total', collisions)
+        keys = list(key.itertuples(index=False, name=None))
+        row_ids = row_ids.copy()
+        taken = set()
+        for pos in sorted(range(len(keys)), key=lambda i: (row_ids[i], keys[i])):
+            row_id = int(row_ids[pos])
+            while row_id in taken:
+                row_id = (row_id + 1) % ROW_ID_YEAR_FACTOR
+            taken.add(row_id)
+            row_ids[pos] = row_id
+    df['row_id'] = row_ids + year * ROW_ID_YEAR_FACTOR
+    return df
+
+def _renumber_groups(df, year, keys):
+    """Menghitung ulang row_id hanya untuk grup (SUPPLIER NAME, CLOSING MONTH) di keys (in place).
+
+    Hasilnya sama dengan _assign_row_ids pada seluruh df, karena row_id satu baris
+    hanya bergantung pada urutannya di dalam grupnya sendiri. Baris dicari per
+    tanggal secara vektor, lalu per nama di antara kandidat saja. Jika row_id
+    baru bentrok atau grup ini bisa menggeser row_id hasil probing di luarnya,
+    seluruh tahun dihitung ulang.
+    """
+    if df.empty or not keys:
+        return df
+    days = pd.to_datetime(df['CLOSING MONTH'], errors='coerce', cache=False).dt.normalize().to_numpy()
+    # Kolom row_id diganti (bukan ditulis di tempat) agar DataFrame lain yang berbagi data tidak ikut berubah
+    row_ids = df['row_id'].to_numpy(dtype='int64', copy=True)
+    for name, month in set(keys):
+        candidates = np.flatnonzero(pd.isna(days) if month == '' else days == np.datetime64(month))
+        names = df['SUPPLIER NAME'].iloc[candidates].astype(str)
+        positions = candidates[(names.isna() if pd.isna(name) else names == name).to_numpy()]
+        if len(positions):
+            new_ids = _row_id_hashes(df.iloc[positions])[1] + year * ROW_ID_YEAR_FACTOR
+            if not _row_ids_local(new_ids, row_ids[positions], np.delete(row_ids, positions), row_ids):
+                return _assign_row_ids(df, year)
+            row_ids[positions] = new_ids
+    df['row_id'] = row_ids
+    return df
+
+def _row_ids_local(new_ids, old_ids, others, all_ids):
+    """True jika row_id baru satu grup (hash tanpa probing) sama dengan hasil _assign_row_ids.
+
+    Syaratnya: row_id baru unik dan tidak dipakai baris di luar grup, dan tidak
+    ada baris yang menempati nomor tepat setelah row_id lama grup (hanya baris
+    hasil probing yang bisa bergeser saat nomor itu kosong).
+    """
+    return (len(np.unique(new_ids)) == len(new_ids)
+            and not np.isin(new_ids, others).any()
+            and not np.isin(_next_row_id(old_ids), all_ids).any())
+
+# --- Cache Data (per proses) ---
+# Setiap file tahunan di-cache berdasarkan path, mtime, dan ukuran file.
+# Hanya file yang berubah yang dibaca ulang dari Excel.
+_DATA_CACHE = {}
+_COMBINED_CACHE = {'signature': None, 'df': None}
+_DATA_CACHE_LOCK = threading.Lock()
+
+def _file_signature(file_path):
+    """Mengembalikan (mtime, size) file, atau None jika file tidak ada."""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# --- Penulisan Atomik & Lock per Tahun ---
+# Semua file ditulis ke file sementara di folder yang sama lalu di-rename
+# (os.replace), jadi pembaca tidak pernah melihat file setengah jadi dan tidak
+# perlu mengambil lock. Penulis mengambil lock per file tahunan yang berlaku
+# antar thread maupun antar proses (beberapa worker gunicorn).
+def _replace_file(src, dst, retries=20):
+    """os.replace dengan retry (di Windows file tujuan bisa sedang dibuka pembaca)."""
+    for attempt in range(retries):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.05)
+
+def _temp_path_for(file_path, suffix):
+    """Membuat file sementara di folder yang sama (nama diawali titik, tidak cocok dengan glob data_*)."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or '.', prefix='.tmp-', suffix=suffix)
+    os.close(fd)
+    return tmp_path
+
+def _atomic_write_excel(df, file_path):
+    """Menulis df ke Excel secara atomik (temp file + rename)."""
+    tmp_path = _temp_path_for(file_path, '.xlsx')
+    try:
+        df.to_excel(tmp_path, index=False)
+        _replace_file(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+_LOCK_RETRY_ERRNOS = {errno.EDEADLK, getattr(errno, 'EDEADLOCK', errno.EDEADLK)}
+
+def _lock_fd(fd):
+    if os.name == 'nt':
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError as e:
+                # LK_LOCK menyerah setelah ~10 detik dengan EDEADLOCK; hanya itu yang dicoba lagi
+                if e.errno not in _LOCK_RETRY_ERRNOS:
+                    raise
+    fcntl.flock(fd, fcntl.LOCK_EX)
+
+def _unlock_fd(fd):
+    if os.name == 'nt':
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+class YearFileLock:
+    """Lock satu file tahunan: reentrant di dalam satu thread, eksklusif antar thread dan proses."""
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                _lock_fd(self._fd)
+            except Exception:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock_fd(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+# --- Sidecar Kolumnar (Arrow IPC / Feather) ---
+# Excel tetap format utama untuk import/export. Setiap data_YYYY.xlsx juga
+# disimpan sebagai data_YYYY.feather yang bisa di-memory-map dan jauh lebih
+# cepat dibaca daripada parsing openpyxl.
+def get_sidecar_path(file_path):
+    """Path file sidecar .feather untuk file data Excel."""
+    return os.path.splitext(file_path)[0] + ".feather"
+
+# Sidecar menyimpan signature file Excel sumbernya di metadata, sehingga sidecar
+# hanya dipakai jika dibuat dari versi Excel yang sama persis.
+def _read_sidecar(file_path, source_signature):
+    """Isi sidecar jika dibuat dari versi Excel dengan source_signature; None jika tidak ada/basi."""
+    if feather is None or source_signature is None:
+        return None
     try:
+        table = feather.read_table(get_sidecar_path(file_path), memory_map=True)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading sidecar for {file_path}, falling back to Excel: {e}")
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(b'source_signature') != json.dumps(list(source_signature)).encode():
+        return None
+    with _timed('sidecar_read'):
+        df = table.to_pandas()
+    _count_read('sidecar', len(df), table.nbytes)
+    return df
+
+def _sidecar_columns(file_path, source_signature):
+    """Nama kolom dari skema sidecar tanpa membaca datanya; None jika tidak ada/basi."""
+    if feather is None or source_signature is None:
+        return None
+    try:
+        with pa.memory_map(get_sidecar_path(file_path)) as source:
+            schema = pa.ipc.open_file(source).schema
+    except Exception:
+        return None
+    if (schema.metadata or {}).get(b'source_signature') != json.dumps(list(source_signature)).encode():
+        return None
+    return list(schema.names)
+
+def write_sidecar(df, file_path, source_signature=None):
+    """Menulis sidecar .feather untuk file Excel secara atomik. Gagal menulis tidak fatal."""
+    if feather is None:
+        return False
+    source_signature = source_signature or _file_signature(file_path)
+    tmp_path = _temp_path_for(file_path, '.feather')
+    try:
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'source_signature'] = json.dumps(list(source_signature)).encode()
+        feather.write_feather(table.replace_schema_metadata(metadata), tmp_path)
+        _replace_file(tmp_path, get_sidecar_path(file_path))
+        return True
+    except Exception as e:
+        print(f"Error writing sidecar for {file_path}: {e}")
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+_BASE_CACHE = {}
+
+def _read_base_cached(file_path, store=True):
+    """(signature, isi mentah file Excel tanpa journal), di-cache berdasarkan signature file Excel.
+
+    store=False: hasil baca tidak disimpan ke cache (dipakai ekspor).
+    """
+    signature = _file_signature(file_path)
+    with _DATA_CACHE_LOCK:
+        cached = _BASE_CACHE.get(file_path)
+    hit = cached is not None and cached[0] == signature
+    _count_cache('base', hit)
+    if hit:
+        return cached
+    df = _read_raw_data_file(file_path, signature)
+    if store:
+        with _DATA_CACHE_LOCK:
+            _BASE_CACHE[file_path] = (signature, df)
+    return signature, df
+
+def _read_raw_data_file(file_path, signature):
+    """Membaca isi mentah file data: dari sidecar jika cocok dengan signature, jika tidak dari Excel."""
+    df = _read_sidecar(file_path, signature)
+    if df is not None:
+        return df
+    with _timed('excel_parse'):
         df = pd.read_excel(file_path)
-        if df.empty:
-            return pd.DataFrame()
-        df.reset_index(inplace=True)
-        df['row_id'] = df.apply(lambda row: hash(f"{os.path.basename(file_path)}-{row['index']}"), axis=1)
-        df.drop(columns=['index'], inplace=True, errors='ignore')
+    _count_read('excel', len(df), signature[1] if signature else 0)
+    write_sidecar(df, file_path, signature)
+    return df
+
+# --- Journal Perubahan (append-only) ---
+# Penambahan, edit, dan hapus satu baris tidak menulis ulang workbook. Operasi
+# dicatat sebagai satu baris JSON di data_YYYY.journal.jsonl dan diterapkan di
+# atas isi Excel saat load. Journal dipadatkan ke Excel di background setelah
+# JOURNAL_COMPACT_THRESHOLD entri atau JOURNAL_COMPACT_IDLE_SECONDS tanpa
+# penulisan, sehingga biaya tulis tidak bergantung pada jumlah baris dalam satu
+# tahun. Setiap entri mencatat signature file Excel tempat ia ditambahkan
+# ('base'). Sebelum workbook ditulis ulang, journal diberi penanda 'compacted'
+# untuk base itu; entri dengan base lama yang diikuti penanda sudah ada di
+# workbook dan diabaikan (mis. proses berhenti sebelum journal sempat dihapus).
+# Entri dengan base lama TANPA penanda berarti workbook diubah di luar aplikasi:
+# entri itu tetap diterapkan saat membaca (dengan peringatan), tetapi semua
+# penulisan ke tahun itu ditolak sampai operator menjalankan `flask resolve-journal`.
+_YEAR_LOCKS = {}
+_YEAR_LOCKS_GUARD = threading.Lock()
+_COMPACTING = set()
+_COMPACT_TIMERS = {}
+
+class JournalConflictError(RuntimeError):
+    """Journal berisi perubahan untuk versi workbook yang sudah diubah di luar aplikasi."""
+
+def get_journal_path(file_path):
+    """Path file journal untuk file data Excel."""
+    return os.path.splitext(file_path)[0] + ".journal.jsonl"
+
+def _year_lock(file_path):
+    """Lock per file tahunan untuk penulisan (antar thread dan antar proses)."""
+    with _YEAR_LOCKS_GUARD:
+        lock = _YEAR_LOCKS.get(file_path)
+        if lock is None:
+            lock = _YEAR_LOCKS[file_path] = YearFileLock(os.path.splitext(file_path)[0] + ".lock")
+        return lock
+
+def _data_signature(file_path):
+    """Signature file Excel + journal-nya, atau None jika file Excel tidak ada."""
+    if _use_sqlite():
+        return _sqlite_signature(file_path)
+    excel_sig = _file_signature(file_path)
+    if excel_sig is None:
+        return None
+    return (excel_sig, _file_signature(get_journal_path(file_path)))
+
+def _journal_encode(value):
+    """Mengubah nilai sel menjadi nilai yang bisa disimpan di JSON."""
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return {'$datetime': pd.Timestamp(value).isoformat()}
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, 'item'):  # skalar numpy
+        return value.item()
+    return value
+
+def _journal_line(op):
+    """Satu operasi sebagai baris JSON journal (nilai sel di-encode)."""
+    return json.dumps({key: ({col: _journal_encode(val) for col, val in value.items()} if isinstance(value, dict) else value)
+                       for key, value in op.items()})
+
+def _journal_decode(value):
+    if isinstance(value, dict) and '$datetime' in value:
+        return pd.Timestamp(value['$datetime'])
+    return value
+
+def _read_journal(file_path, base_signature=None, offset=0):
+    """Membaca operasi journal yang belum ada di workbook versi base_signature, mulai dari byte offset.
+
+    base_signature None: semua operasi. Entri dengan base lain dilewati hanya
+    jika setelahnya ada penanda 'compacted' untuk base itu. Mengembalikan (ops,
+    offset setelah baris lengkap terakhir); baris terakhir yang belum lengkap
+    (sedang ditulis) belum dibaca.
+    """
+    entries = []
+    try:
+        with open(get_journal_path(file_path), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                _count('bytes_read_total', len(line), source='journal')
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    print(f"Skipping malformed journal line in {file_path}")
+    except FileNotFoundError:
+        pass
+    base = list(base_signature) if base_signature is not None else None
+    ops = []
+    compacted = []  # base yang sudah dipadatkan oleh entri-entri SETELAH posisi ini
+    for op in reversed(entries):
+        if op.get('op') == 'compacted':
+            compacted.append(op.get('base'))
+        elif base is None or op.get('base') == base or op.get('base') not in compacted:
+            ops.append(op)
+    ops.reverse()
+    return ops, offset
+
+def _journal_orphans(file_path, base_signature):
+    """Entri journal yang ditulis untuk versi workbook lain dan belum pernah dipadatkan."""
+    if base_signature is None:
+        return []
+    base = list(base_signature)
+    return [op for op in _read_journal(file_path, base_signature)[0] if op.get('base') != base]
+
+def _check_journal_conflict(file_path):
+    """JournalConflictError jika workbook diubah di luar aplikasi saat journal-nya belum dipadatkan."""
+    orphans = _journal_orphans(file_path, _file_signature(file_path))
+    if orphans:
+        name = os.path.basename(file_path)
+        raise JournalConflictError(
+            f"{name} was modified outside the app while {len(orphans)} journaled change(s) were not yet saved to it. "
+            f"Writes to this year are blocked until an operator runs "
+            f"'flask resolve-journal {name} --apply' (re-apply them) or '--discard'.")
+
+def _set_values(df, positions, col, value):
+    """Mengisi value ke baris-baris positions pada kolom col dengan mengganti seluruh kolomnya."""
+    if col not in df.columns:
+        df.loc[positions, col] = value
+        return
+    column = df[col].copy()
+    try:
+        column.iloc[positions] = value
+    except (TypeError, ValueError):
+        # pandas 3 tidak lagi meng-upcast otomatis (mis. 1234.5 ke kolom int64): upcast di sini
+        column = column.astype(object)
+        column.iloc[positions] = value
+        column = column.infer_objects()
+    df[col] = column
+
+def _apply_journal(df, ops, year, strict=True):
+    """Menerapkan operasi journal secara berurutan ke df yang sudah memiliki row_id.
+
+    Setelah setiap operasi hanya grup (SUPPLIER NAME, CLOSING MONTH) yang
+    tersentuh yang diberi row_id baru, sehingga hasilnya sama persis dengan
+    row_id setelah journal dipadatkan ke Excel. Penambahan yang berurutan
+    digabung dalam satu concat. strict=False melewati operasi yang gagal
+    (dicetak) alih-alih menggagalkan seluruh tahun.
+    """
+    df = df.reset_index(drop=True)
+    appended = []
+
+    def flush(df):
+        if not appended:
+            return df
+        # Satu frame per baris, agar hasilnya sama dengan menambahkan baris satu per satu
+        new_rows = [pd.DataFrame([dict(row, row_id=0)]) for row in appended]
+        appended.clear()
+        start = 0 if df.empty else len(df)
+        df = pd.concat(new_rows if df.empty else [df] + new_rows, ignore_index=True)
+        return _renumber_groups(df, year, _group_keys(df, range(start, len(df))))
+
+    for op in ops:
+        try:
+            if op['op'] == 'append':
+                appended.append({col: _journal_decode(val) for col, val in op['row'].items()})
+                continue
+            df = flush(df)
+            positions = np.flatnonzero(df['row_id'].to_numpy() == op['row_id']) if 'row_id' in df.columns else []
+            if not len(positions):
+                continue
+            keys = _group_keys(df, positions)
+            if op['op'] == 'update':
+                df = df.copy(deep=False)
+                for col, val in op['values'].items():
+                    _set_values(df, positions, col, _journal_decode(val))
+                new_keys = _group_keys(df, positions)
+                # Supplier dan tanggal tidak berubah: urutan dalam grup tetap, row_id juga
+                keys = [] if new_keys == keys else keys + new_keys
+            elif op['op'] == 'delete':
+                df = df.drop(index=positions).reset_index(drop=True)
+            df = _renumber_groups(df, year, keys)
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Skipping journal entry {op.get('op')} {op.get('row_id', '')} for year {year}: {e}")
+    try:
+        return flush(df)
+    except Exception as e:
+        if strict:
+            raise
+        print(f"Skipping appended journal rows for year {year}: {e}")
         return df
+
+def _journal_append(file_path, op):
+    """Menambahkan satu operasi ke journal setelah memvalidasinya pada data saat ini.
+
+    Operasi (persis seperti yang akan dibaca ulang dari JSON) diterapkan dulu ke
+    isi tahun saat ini; jika gagal, penulisan ditolak dan journal tidak berubah.
+    """
+    with _year_lock(file_path):
+        signature, df = _load_year(file_path)
+        if signature is None:
+            raise FileNotFoundError(f"Data file not found: {file_path}")
+        _check_journal_conflict(file_path)
+        op = dict(op, base=list(signature[0]))
+        line = _journal_line(op)
+        df = _apply_journal(df, [json.loads(line)], _year_from_file_path(file_path))
+        with open(get_journal_path(file_path), 'ab') as f:
+            f.write(line.encode('utf-8') + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+            offset = f.tell()
+        # Hasil validasi langsung menjadi isi cache: load berikutnya tidak perlu replay
+        with _DATA_CACHE_LOCK:
+            _DATA_CACHE[file_path] = (_data_signature(file_path), df, offset)
+    _maybe_schedule_compaction(file_path)
+
+def compact_journal(file_path):
+    """Menulis ulang file Excel dengan semua operasi journal, lalu menghapus journal."""
+    with _year_lock(file_path):
+        if not os.path.exists(get_journal_path(file_path)):
+            return False
+        # Dibaca langsung (bukan lewat cache) agar error apa pun membatalkan penulisan
+        df = _read_excel_data_file(file_path)
+        _write_data_file(df, file_path)
+        return True
+
+def _maybe_schedule_compaction(file_path):
+    """Memadatkan journal di background: segera jika sudah JOURNAL_COMPACT_THRESHOLD entri,
+    selain itu setelah JOURNAL_COMPACT_IDLE_SECONDS tanpa penulisan baru."""
+    if len(_read_journal(file_path)[0]) >= app.config['JOURNAL_COMPACT_THRESHOLD']:
+        _start_compaction(file_path)
+        return
+    idle = app.config['JOURNAL_COMPACT_IDLE_SECONDS']
+    if idle is None:
+        return
+    with _YEAR_LOCKS_GUARD:
+        # Setiap penulisan menunda compaction lagi (timer diganti)
+        timer = _COMPACT_TIMERS.pop(file_path, None)
+        if timer is not None:
+            timer.cancel()
+        timer = _COMPACT_TIMERS[file_path] = threading.Timer(idle, _start_compaction, args=(file_path,))
+        timer.daemon = True
+        timer.start()
+
+def _start_compaction(file_path):
+    """Menjalankan compact_journal di thread background (paling banyak satu per file)."""
+    with _YEAR_LOCKS_GUARD:
+        if file_path in _COMPACTING:
+            return
+        _COMPACTING.add(file_path)
+
+    def run():
+        try:
+            compact_journal(file_path)
+        except Exception as e:
+            print(f"Error compacting journal for {file_path}: {e}")
+        finally:
+            with _YEAR_LOCKS_GUARD:
+                _COMPACTING.discard(file_path)
+
+    threading.Thread(target=run, daemon=True).start()
+
+_STARTUP_COMPACTION = {'done': False}
+
+@app.before_request
+def _compact_leftover_journals():
+    """Sekali per proses: padatkan journal yang tertinggal (mis. dari proses sebelumnya)."""
+    if _STARTUP_COMPACTION['done']:
+        return
+    with _YEAR_LOCKS_GUARD:
+        if _STARTUP_COMPACTION['done']:
+            return
+        _STARTUP_COMPACTION['done'] = True
+    if app.config['JOURNAL_COMPACT_IDLE_SECONDS'] is None or _use_sqlite():
+        return
+    for file_path in glob.glob(os.path.join(DATA_FOLDER_PATH, "data_*.xlsx")):
+        if os.path.exists(get_journal_path(file_path)):
+            _start_compaction(file_path)
+
+def append_row(file_path, row):
+    """Menambahkan satu baris ke file tahunan tanpa menulis ulang workbook."""
+    with _timed('row_write'):
+        if _use_sqlite():
+            return _sqlite_append_row(file_path, row)
+        with _year_lock(file_path):
+            if not os.path.exists(file_path):
+                # File baru: cukup tulis langsung satu baris
+                return _write_data_file(pd.DataFrame([row]), file_path)
+            _journal_append(file_path, {'op': 'append', 'row': row})
+    return True
+
+def update_row(file_path, row_id, values):
+    """Mengubah kolom-kolom satu baris (berdasarkan row_id) di file tahunan."""
+    with _timed('row_write'):
+        if _use_sqlite():
+            return _sqlite_update_row(file_path, row_id, values)
+        _journal_append(file_path, {'op': 'update', 'row_id': int(row_id), 'values': values})
+    return True
+
+def delete_row(file_path, row_id):
+    """Menghapus satu baris (berdasarkan row_id) dari file tahunan."""
+    with _timed('row_write'):
+        if _use_sqlite():
+            return _sqlite_delete_row(file_path, row_id)
+        _journal_append(file_path, {'op': 'delete', 'row_id': int(row_id)})
+    return True
+
+def _read_data_file(file_path):
+    """Membaca data SATU tahun dari engine aktif, dengan kolom row_id, tanpa menyimpannya di cache.
+
+    Entri journal yang gagal diterapkan dilewati, bukan menggagalkan seluruh tahun.
+    """
+    if _use_sqlite():
+        return _sqlite_read_year(file_path)
+    return _replay_excel_file(file_path, strict=False, store_base=False)[0]
+
+def _read_excel_data_file(file_path, strict=True):
+    """Membaca SATU file data + journal-nya dan menambahkan kolom row_id.
+
+    strict=True (dipakai compaction dan storage-import): entri journal yang
+    gagal diterapkan menggagalkan pembacaan.
+    """
+    return _replay_excel_file(file_path, strict)[0]
+
+def _replay_excel_file(file_path, strict, store_base=True):
+    """(DataFrame isi Excel + seluruh journal, offset journal yang sudah dibaca)."""
+    base_signature, df = _read_base_cached(file_path, store=store_base)
+    ops, offset = _read_journal(file_path, base_signature)
+    orphans = sum(op.get('base') != list(base_signature) for op in ops) if base_signature is not None else 0
+    if orphans:
+        _count('journal_orphaned_entries_total', orphans)
+        print(f"WARNING: {os.path.basename(file_path)} was modified outside the app; {orphans} journaled "
+              f"change(s) made before that are applied on top of it but NOT saved in the workbook. "
+              f"Writes to this year are blocked until 'flask resolve-journal {os.path.basename(file_path)}' is run.")
+    if df.empty and not ops:
+        return pd.DataFrame(), offset
+    year = _year_from_file_path(file_path)
+    with _timed('journal_apply'):
+        return _apply_journal(_assign_row_ids(df.reset_index(drop=True).copy(), year), ops, year, strict), offset
+
+def _load_data_cached(file_path):
+    """Mengembalikan (signature, DataFrame) dari cache; error baca menghasilkan DataFrame kosong."""
+    try:
+        return _load_year(file_path)
     except FileNotFoundError:
-        return pd.DataFrame()
+        return None, pd.DataFrame()
     except Exception as e:
         print(f"Error loading data from {file_path}: {e}")
-        return pd.DataFrame()
+        return None, pd.DataFrame()
+
+def _load_year(file_path):
+    """Mengembalikan (signature, DataFrame) dari cache; membaca ulang hanya jika file berubah.
+
+    Jika file Excel sama dan journal hanya bertambah (mis. ditulis proses lain),
+    hanya entri journal baru yang diterapkan ke DataFrame di cache. Error baca
+    diteruskan ke pemanggil (dipakai jalur penulisan).
+    """
+    signature = _data_signature(file_path)
+    if signature is None:
+        with _DATA_CACHE_LOCK:
+            _DATA_CACHE.pop(file_path, None)
+        return None, pd.DataFrame()
+    with _DATA_CACHE_LOCK:
+        cached = _DATA_CACHE.get(file_path)
+    hit = cached is not None and cached[0] == signature
+    _count_cache('data', hit)
+    if hit:
+        return cached[:2]
+    offset = None
+    if _use_sqlite():
+        df = _sqlite_read_year(file_path)
+    elif cached is not None and cached[2] is not None and cached[0][0] == signature[0]:
+        ops, offset = _read_journal(file_path, signature[0], cached[2])
+        with _timed('journal_apply'):
+            df = _apply_journal(cached[1], ops, _year_from_file_path(file_path), strict=False)
+    else:
+        df, offset = _replay_excel_file(file_path, strict=False)
+    with _DATA_CACHE_LOCK:
+        _DATA_CACHE[file_path] = (signature, df, offset)
+    return signature, df
+
+def invalidate_data_cache(file_path=None):
+    """Menghapus cache untuk satu file (atau semua file jika file_path None)."""
+    with _DATA_CACHE_LOCK:
+        if file_path is None:
+            _DATA_CACHE.clear()
+            _BASE_CACHE.clear()
+        else:
+            _DATA_CACHE.pop(file_path, None)
+            _BASE_CACHE.pop(file_path, None)
+        _COMBINED_CACHE['signature'] = None
+        _COMBINED_CACHE['df'] = None
+
+def find_row(file_path, row_id):
+    """Mencari satu baris berdasarkan row_id (pencarian vektor di cache). None jika tidak ada.
+
+    Tanpa indeks dict terpisah: indeks seperti itu harus dibangun ulang (O(baris))
+    setiap kali journal bertambah, sedangkan perbandingan numpy cukup murah.
+    """
+    if _use_sqlite():
+        return _sqlite_find_row(file_path, row_id)
+    df = _load_data_cached(file_path)[1]
+    if df.empty:
+        return None
+    positions = np.flatnonzero(df['row_id'].to_numpy() == int(row_id))
+    return df.iloc[positions[0]].copy() if len(positions) else None
+
+def load_data(file_path):
+    """Memuat data dari SATU path file Excel yang spesifik."""
+    # Kembalikan salinan agar route yang memodifikasi df tidak merusak cache
+    return _load_data_cached(file_path)[1].copy()
 
 def load_all_data():
     """Mencari semua file data_YYYY.xlsx, memuat, dan menggabungkannya."""
-    all_files = glob.glob(os.path.join(DATA_FOLDER_PATH, "data_*.xlsx"))
+    all_files = list_data_files()
     if not all_files:
         return pd.DataFrame()
-    df_list = [load_data(fp) for fp in all_files]
+    loaded = [(fp,) + _load_data_cached(fp) for fp in all_files]
+    # Signature gabungan: jika tidak ada file yang berubah, pakai hasil concat sebelumnya
+    signature = tuple((fp, sig) for fp, sig, _ in loaded)
+    df_list = [df for _, _, df in loaded]
+    with _DATA_CACHE_LOCK:
+        if _COMBINED_CACHE['signature'] == signature and _COMBINED_CACHE['df'] is not None:
+            return _COMBINED_CACHE['df'].copy()
     if not df_list:
         return pd.DataFrame()
-    return pd.concat(df_list, ignore_index=True)
+    with _timed('concat'):
+        combined = pd.concat(df_list, ignore_index=True)
+    with _DATA_CACHE_LOCK:
+        _COMBINED_CACHE['signature'] = signature
+        _COMBINED_CACHE['df'] = combined
+    return combined.copy()
+
+def _write_data_file(df, file_path):
+    """Mengganti seluruh isi satu tahun di engine aktif."""
+    with _timed('save_data'):
+        if _use_sqlite():
+            return _sqlite_write_year(df, file_path)
+        return _write_excel_data_file(df, file_path)
+
+def _write_excel_data_file(df, file_path, resolve=False):
+    """Menulis ulang seluruh file Excel (+ sidecar) dan mengosongkan journal-nya.
+
+    Ditolak (JournalConflictError) jika journal berisi entri yatim, kecuali
+    resolve=True (dipakai `flask resolve-journal --apply`).
+    """
+    with _year_lock(file_path):
+        if not resolve:
+            _check_journal_conflict(file_path)
+        journal_path = get_journal_path(file_path)
+        signature = _file_signature(file_path)
+        if signature is not None and os.path.exists(journal_path):
+            # Penanda dulu: jika proses berhenti sebelum journal dihapus, entrinya tidak dianggap yatim
+            with open(journal_path, 'ab') as f:
+                f.write(json.dumps({'op': 'compacted', 'base': list(signature)}).encode('utf-8') + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            df_to_save = df.drop(columns=['row_id'], errors='ignore')
+            _atomic_write_excel(df_to_save, file_path)
+            write_sidecar(df_to_save, file_path)
+            # Entri journal lama sudah ada di workbook; hapus filenya
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+        finally:
+            invalidate_data_cache(file_path)
+    return True
 
 def save_data(df, file_path):
     """Menyimpan seluruh DataFrame ke path file Excel yang spesifik."""
     try:
-        df_to_save = df.drop(columns=['row_id'], errors='ignore')
-        df_to_save.to_excel(file_path, index=False)
-        return True
+        return _write_data_file(df, file_path)
     except Exception as e:
         flash(f"Failed to save Excel file to {file_path}. Error: {e}", "danger")
         return False
 
+# --- Storage Engine ---
+# STORAGE_ENGINE memilih tempat data disimpan: 'excel' (file data_YYYY.xlsx +
+# sidecar + journal, default) atau 'sqlite' (satu database data.sqlite3 di
+# folder data). Di kedua engine satu tahun tetap diwakili path data_YYYY.xlsx
+# (get_data_file_path), jadi cache, indeks supplier dan rollup tidak berubah;
+# hanya fungsi primitif baca/tulis di atas yang bercabang ke engine aktif.
+# Gunakan `flask storage-import` / `flask storage-export` untuk berpindah engine.
+SQLITE_FILE_NAME = "data.sqlite3"
+_SQLITE_LOCAL = threading.local()
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    year INTEGER NOT NULL,
+    row_id INTEGER NOT NULL,
+    supplier_name TEXT,
+    closing_month TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rows_supplier_month ON rows (supplier_name, closing_month);
+CREATE INDEX IF NOT EXISTS idx_rows_year_supplier_month ON rows (year, supplier_name, closing_month);
+CREATE INDEX IF NOT EXISTS idx_rows_row_id ON rows (row_id);
+CREATE TABLE IF NOT EXISTS years (
+    year INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    columns TEXT NOT NULL
+);
+"""
+
+def _use_sqlite():
+    return app.config['STORAGE_ENGINE'] == 'sqlite'
+
+def list_data_files():
+    """Path data_YYYY.xlsx untuk setiap tahun yang ada di engine aktif (terurut)."""
+    if _use_sqlite():
+        years = _sqlite_connect().execute("SELECT year FROM years ORDER BY year").fetchall()
+        return [get_data_file_path(year) for (year,) in years]
+    return sorted(glob.glob(os.path.join(DATA_FOLDER_PATH, "data_*.xlsx")))
+
+def year_supplier_counts(file_path):
+    """Jumlah baris per supplier untuk satu tahun (query ber-indeks di SQLite)."""
+    if _use_sqlite():
+        rows = _sqlite_connect(file_path).execute(
+            "SELECT supplier_name, COUNT(*) FROM rows WHERE year = ? AND supplier_name IS NOT NULL GROUP BY supplier_name",
+            (_year_from_file_path(file_path),)).fetchall()
+        return dict(rows)
+    return supplier_counts(_load_data_cached(file_path)[1])
+
+def year_columns(file_path):
+    """Nama kolom satu tahun (tanpa row_id) tanpa memuat datanya."""
+    if _use_sqlite():
+        with _sqlite_transaction(file_path) as conn:
+            return _sqlite_columns(conn, _year_from_file_path(file_path))
+    with _DATA_CACHE_LOCK:
+        cached = _DATA_CACHE.get(file_path)
+    if cached is not None and cached[0] == _data_signature(file_path):
+        return [col for col in cached[1].columns if col != 'row_id']
+    signature = _file_signature(file_path)
+    columns = _sidecar_columns(file_path, signature)
+    if columns is None:
+        columns = list(pd.read_excel(file_path, nrows=0).columns)
+    # Baris yang ditambah/diubah lewat journal bisa membawa kolom baru (ditaruh di akhir, seperti saat replay)
+    for op in _read_journal(file_path, signature)[0]:
+        columns += [col for col in op.get('row', op.get('values', {})) if col not in columns]
+    return columns
+
+def year_template(file_path):
+    """(nama kolom tanpa row_id, baris pertama sebagai dict atau None) untuk menyusun baris baru.
+
+    Di SQLite kolom diambil dari tabel years dan hanya satu baris yang dibaca.
+    """
+    if _use_sqlite():
+        year = _year_from_file_path(file_path)
+        with _sqlite_transaction(file_path) as conn:
+            columns = _sqlite_columns(conn, year)
+            found = conn.execute("SELECT data FROM rows WHERE year = ? ORDER BY seq LIMIT 1", (year,)).fetchone()
+        return columns, (None if found is None else _sqlite_frame([found[0]], columns).iloc[0].to_dict())
+    # Excel: DataFrame tahun ini sudah ada di cache (tanpa salinan)
+    df = _load_data_cached(file_path)[1]
+    return [col for col in df.columns if col != 'row_id'], (None if df.empty else df.iloc[0].to_dict())
+
+def year_month_counts(file_path):
+    """Jumlah baris per (nama ternormalisasi, 'YYYY-MM') untuk satu tahun (lihat supplier_month_counts)."""
+    if _use_sqlite():
+        rows = _sqlite_connect(file_path).execute(
+            "SELECT supplier_name, substr(closing_month, 1, 7), COUNT(*) FROM rows "
+            "WHERE year = ? AND supplier_name IS NOT NULL AND closing_month != '' GROUP BY 1, 2",
+            (_year_from_file_path(file_path),)).fetchall()
+        counts = {}
+        for name, month, count in rows:
+            key = (normalize_supplier_name(name), month)
+            counts[key] = counts.get(key, 0) + count
+        return counts
+    return supplier_month_counts(_load_data_cached(file_path)[1])
+
+def get_sqlite_path(file_path=None):
+    """Path database SQLite: di folder yang sama dengan file data tahunan."""
+    return os.path.join(os.path.dirname(file_path) if file_path else DATA_FOLDER_PATH, SQLITE_FILE_NAME)
+
+def _sqlite_connect(file_path=None):
+    """Koneksi SQLite per thread (mode WAL: pembaca tidak pernah menunggu penulis)."""
+    path = get_sqlite_path(file_path)
+    connections = getattr(_SQLITE_LOCAL, 'connections', None)
+    if connections is None:
+        connections = _SQLITE_LOCAL.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SQLITE_SCHEMA)
+        connections[path] = conn
+    return conn
+
+@contextlib.contextmanager
+def _sqlite_transaction(file_path, write=False):
+    """Transaksi SQLite; write=True mengambil lock tulis sejak awal (BEGIN IMMEDIATE)."""
+    conn = _sqlite_connect(file_path)
+    conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _sqlite_signature(file_path):
+    """Versi tahun di database (naik setiap penulisan), atau None jika tahun belum ada."""
+    found = _sqlite_connect(file_path).execute(
+        "SELECT version FROM years WHERE year = ?", (_year_from_file_path(file_path),)).fetchone()
+    return None if found is None else ('sqlite', found[0])
+
+def _sqlite_encode_row(row):
+    return json.dumps({col: _journal_encode(val) for col, val in row.items()})
+
+def _sqlite_frame(datas, columns):
+    """Kolom data (JSON per baris) -> DataFrame dengan urutan kolom tahunannya."""
+    df = pd.DataFrame([json.loads(data) for data in datas], columns=columns)
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].dropna()
+        if not values.empty and isinstance(values.iloc[0], dict):
+            df[col] = pd.to_datetime(df[col].map(lambda v: v['$datetime'] if isinstance(v, dict) else None))
+    return df
+
+def _sqlite_keys(name, month):
+    """Nilai kolom ber-indeks (supplier_name, closing_month) untuk satu baris."""
+    month = pd.to_datetime(month, errors='coerce')
+    return (None if pd.isna(name) else str(name)), ('' if pd.isna(month) else month.strftime('%Y-%m-%d'))
+
+def _sqlite_touch_year(conn, year, columns):
+    """Menaikkan versi tahun (untuk cache) dan menyimpan urutan kolomnya. Mengembalikan versi baru."""
+    conn.execute("INSERT INTO years (year, version, columns) VALUES (?, 1, ?) "
+                 "ON CONFLICT(year) DO UPDATE SET version = version + 1, columns = excluded.columns",
+                 (year, json.dumps(columns)))
+    return conn.execute("SELECT version FROM years WHERE year = ?", (year,)).fetchone()[0]
+
+def _sqlite_cache_apply(file_path, version, op):
+    """Menerapkan satu penulisan ke DataFrame tahun di cache, seperti _journal_append.
+
+    Hanya jika cache berisi tepat versi sebelum penulisan ini (version - 1);
+    selain itu cache dibiarkan dan load berikutnya membaca ulang tahun itu.
+    Operasi melewati JSON dulu agar nilainya sama dengan yang dibaca dari database.
+    """
+    with _DATA_CACHE_LOCK:
+        cached = _DATA_CACHE.get(file_path)
+    if cached is None or cached[0] != ('sqlite', version - 1):
+        return
+    op = json.loads(_journal_line(op))
+    try:
+        df = _apply_journal(cached[1], [op], _year_from_file_path(file_path))
+    except Exception as e:
+        print(f"Error updating cached data for {file_path}: {e}")
+        invalidate_data_cache(file_path)
+        return
+    with _DATA_CACHE_LOCK:
+        if _DATA_CACHE.get(file_path) is cached:
+            _DATA_CACHE[file_path] = (('sqlite', version), df, None)
+
+def _sqlite_columns(conn, year):
+    found = conn.execute("SELECT columns FROM years WHERE year = ?", (year,)).fetchone()
+    return [] if found is None else json.loads(found[0])
+
+def _sqlite_renumber(conn, year, supplier_name, closing_month):
+    """Menghitung ulang row_id satu grup (supplier, bulan) setelah baris ditambah/diubah/dihapus."""
+    rows = conn.execute("SELECT seq, data, row_id FROM rows WHERE year = ? AND supplier_name IS ? AND closing_month = ? ORDER BY seq",
+                        (year, supplier_name, closing_month)).fetchall()
+    if not rows:
+        return
+    seqs = [seq for seq, _, _ in rows]
+    group = _sqlite_frame([data for _, data, _ in rows], ['SUPPLIER NAME', 'CLOSING MONTH'])
+    new_ids = _row_id_hashes(group)[1] + year * ROW_ID_YEAR_FACTOR
+    old_ids = np.array([row_id for _, _, row_id in rows], dtype='int64')
+    # Hanya row_id yang relevan untuk _row_ids_local yang dibaca (lewat idx_rows_row_id)
+    lookup = list(dict.fromkeys(new_ids.tolist() + _next_row_id(old_ids).tolist()))
+    found = conn.execute(f"SELECT seq, row_id FROM rows WHERE row_id IN ({','.join('?' * len(lookup))})", lookup).fetchall()
+    others = [row_id for seq, row_id in found if seq not in seqs]
+    if not _row_ids_local(new_ids, old_ids, others, [row_id for _, row_id in found] + old_ids.tolist()):
+        # Bentrokan hash (sangat jarang): hitung ulang seluruh tahun seperti _sqlite_write_year
+        rows = conn.execute("SELECT seq, data FROM rows WHERE year = ? ORDER BY seq", (year,)).fetchall()
+        seqs = [seq for seq, _ in rows]
+        new_ids = _assign_row_ids(_sqlite_frame([data for _, data in rows], ['SUPPLIER NAME', 'CLOSING MONTH']), year)['row_id']
+    conn.executemany("UPDATE rows SET row_id = ? WHERE seq = ?", zip(np.asarray(new_ids).tolist(), seqs))
+
+def _sqlite_read_year(file_path):
+    """Semua baris satu tahun (urutan penulisan), dengan row_id tersimpan."""
+    year = _year_from_file_path(file_path)
+    with _timed('sqlite_read'):
+        with _sqlite_transaction(file_path) as conn:
+            columns = _sqlite_columns(conn, year)
+            rows = conn.execute("SELECT data, row_id FROM rows WHERE year = ? ORDER BY seq", (year,)).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        df = _sqlite_frame([data for data, _ in rows], columns)
+        df['row_id'] = pd.Series([row_id for _, row_id in rows], dtype='int64')
+    _count_read('sqlite', len(rows), sum(len(data) for data, _ in rows))
+    return df
+
+def _sqlite_find_row(file_path, row_id):
+    """Satu baris berdasarkan row_id lewat indeks database. None jika tidak ada."""
+    year = _year_from_file_path(file_path)
+    with _sqlite_transaction(file_path) as conn:
+        found = conn.execute("SELECT data, row_id FROM rows WHERE year = ? AND row_id = ?", (year, int(row_id))).fetchone()
+        columns = _sqlite_columns(conn, year) if found else None
+    if found is None:
+        return None
+    df = _sqlite_frame([found[0]], columns)
+    df['row_id'] = found[1]
+    return df.iloc[0].copy()
+
+def _sqlite_append_row(file_path, row):
+    year = _year_from_file_path(file_path)
+    name, month = _sqlite_keys(row.get('SUPPLIER NAME'), row.get('CLOSING MONTH'))
+    with _sqlite_transaction(file_path, write=True) as conn:
+        columns = _sqlite_columns(conn, year)
+        columns += [col for col in row if col not in columns]
+        conn.execute("INSERT INTO rows (year, row_id, supplier_name, closing_month, data) VALUES (?, 0, ?, ?, ?)",
+                     (year, name, month, _sqlite_encode_row(row)))
+        _sqlite_renumber(conn, year, name, month)
+        version = _sqlite_touch_year(conn, year, columns)
+    _sqlite_cache_apply(file_path, version, {'op': 'append', 'row': row})
+    return True
+
+def _sqlite_update_row(file_path, row_id, values):
+    year = _year_from_file_path(file_path)
+    with _sqlite_transaction(file_path, write=True) as conn:
+        found = conn.execute("SELECT seq, supplier_name, closing_month, data FROM rows WHERE year = ? AND row_id = ?",
+                             (year, int(row_id))).fetchone()
+        if found is None:
+            return True  # sama seperti journal: update ke baris yang tidak ada diabaikan
+        seq, old_name, old_month, data = found
+        data = json.loads(data)
+        data.update({col: _journal_encode(val) for col, val in values.items()})
+        row = {col: _journal_decode(val) for col, val in data.items()}
+        name, month = _sqlite_keys(row.get('SUPPLIER NAME'), row.get('CLOSING MONTH'))
+        conn.execute("UPDATE rows SET supplier_name = ?, closing_month = ?, data = ? WHERE seq = ?",
+                     (name, month, json.dumps(data), seq))
+        _sqlite_renumber(conn, year, old_name, old_month)
+        if (name, month) != (old_name, old_month):
+            _sqlite_renumber(conn, year, name, month)
+        columns = _sqlite_columns(conn, year)
+        version = _sqlite_touch_year(conn, year, columns + [col for col in values if col not in columns])
+    _sqlite_cache_apply(file_path, version, {'op': 'update', 'row_id': int(row_id), 'values': values})
+    return True
+
+def _sqlite_delete_row(file_path, row_id):
+    year = _year_from_file_path(file_path)
+    with _sqlite_transaction(file_path, write=True) as conn:
+        found = conn.execute("SELECT seq, supplier_name, closing_month FROM rows WHERE year = ? AND row_id = ?",
+                             (year, int(row_id))).fetchone()
+        if found is None:
+            return True
+        conn.execute("DELETE FROM rows WHERE seq = ?", (found[0],))
+        _sqlite_renumber(conn, year, found[1], found[2])
+        version = _sqlite_touch_year(conn, year, _sqlite_columns(conn, year))
+    _sqlite_cache_apply(file_path, version, {'op': 'delete', 'row_id': int(row_id)})
+    return True
+
+def _sqlite_write_year(df, file_path):
+    """Mengganti semua baris satu tahun dalam satu transaksi."""
+    year = _year_from_file_path(file_path)
+    df = df.drop(columns=['row_id'], errors='ignore')
+    columns = list(df.columns)
+    datas = [json.dumps({col: _journal_encode(val) for col, val in zip(columns, values)})
+             for values in df.itertuples(index=False, name=None)]
+    # row_id dihitung dari data yang sudah melalui JSON, sama seperti _sqlite_renumber
+    frame = _assign_row_ids(_sqlite_frame(datas, columns), year)
+    names = [None if pd.isna(name) else str(name) for name in frame['SUPPLIER NAME']] if datas else []
+    months = pd.to_datetime(frame['CLOSING MONTH'], errors='coerce').dt.strftime('%Y-%m-%d').fillna('').tolist() if datas else []
+    try:
+        with _sqlite_transaction(file_path, write=True) as conn:
+            conn.execute("DELETE FROM rows WHERE year = ?", (year,))
+            conn.executemany("INSERT INTO rows (year, row_id, supplier_name, closing_month, data) VALUES (?, ?, ?, ?, ?)",
+                             zip([year] * len(datas), frame['row_id'].tolist(), names, months, datas))
+            _sqlite_touch_year(conn, year, columns)
+    finally:
+        invalidate_data_cache(file_path)
+    return True
+
+# --- Indeks Supplier ---
+# Indeks nama supplier yang dipelihara di memori: nama ternormalisasi -> nama
+# asli, plus jumlah baris per tahun untuk setiap supplier dan per bulan (untuk
+# cek duplikat). Dibangun sekali dari file data, lalu diperbarui secara
+# inkremental oleh setiap route penulisan.
+_SUPPLIER_INDEX = {
+    'built': False,
+    'signatures': {},  # file_path -> signature file saat kontribusinya dihitung
+    'by_year': {},     # tahun -> {nama supplier: jumlah baris}
+    'months': {},      # tahun -> {(nama ternormalisasi, 'YYYY-MM'): jumlah baris}
+    'normalized': {},  # nama ternormalisasi -> set nama supplier asli
+    'sorted': None,    # daftar nama terurut (di-cache sampai ada perubahan)
+}
+_SUPPLIER_INDEX_LOCK = threading.RLock()
+
+def normalize_supplier_name(name):
+    """Normalisasi nama supplier untuk pencarian (trim + huruf kecil)."""
+    return str(name).strip().lower()
+
+def _supplier_index_adjust(year, name, delta):
+    """Menambah/mengurangi jumlah baris supplier pada satu tahun."""
+    year_counts = _SUPPLIER_INDEX['by_year'].setdefault(year, {})
+    new_count = year_counts.get(name, 0) + delta
+    if new_count > 0:
+        year_counts[name] = new_count
+        _SUPPLIER_INDEX['normalized'].setdefault(normalize_supplier_name(name), set()).add(name)
+    else:
+        year_counts.pop(name, None)
+        if not any(name in counts for counts in _SUPPLIER_INDEX['by_year'].values()):
+            norm = normalize_supplier_name(name)
+            names = _SUPPLIER_INDEX['normalized'].get(norm, set())
+            names.discard(name)
+            if not names:
+                _SUPPLIER_INDEX['normalized'].pop(norm, None)
+    _SUPPLIER_INDEX['sorted'] = None
+
+def _month_key(name, month):
+    """Kunci indeks bulan: (nama ternormalisasi, 'YYYY-MM')."""
+    return normalize_supplier_name(name), pd.Timestamp(month).strftime('%Y-%m')
+
+def _supplier_index_adjust_month(year, name, month, delta):
+    """Menambah/mengurangi jumlah baris supplier pada satu bulan."""
+    if pd.isna(month):
+        return
+    month_counts = _SUPPLIER_INDEX['months'].setdefault(year, {})
+    key = _month_key(name, month)
+    new_count = month_counts.get(key, 0) + delta
+    if new_count > 0:
+        month_counts[key] = new_count
+    else:
+        month_counts.pop(key, None)
+
+def supplier_counts(df):
+    """Jumlah baris per nama supplier dalam df."""
+    if df.empty or 'SUPPLIER NAME' not in df.columns:
+        return {}
+    return {name: int(count) for name, count in df['SUPPLIER NAME'].dropna().value_counts().items()}
+
+def supplier_month_counts(df):
+    """Jumlah baris per (nama ternormalisasi, 'YYYY-MM') dalam df."""
+    if df.empty or 'SUPPLIER NAME' not in df.columns or 'CLOSING MONTH' not in df.columns:
+        return {}
+    months = pd.to_datetime(df['CLOSING MONTH'], errors='coerce', cache=False)
+    valid = (df['SUPPLIER NAME'].notna() & months.notna()).to_numpy()
+    keys = pd.DataFrame({'name': df['SUPPLIER NAME'].astype(str).str.strip().str.lower().to_numpy()[valid],
+                         'month': months.dt.strftime('%Y-%m').to_numpy()[valid]})
+    return {key: int(count) for key, count in keys.value_counts().items()}
+
+def _supplier_index_set_year(file_path, counts, month_counts):
+    """Mengganti seluruh kontribusi satu file tahunan dengan counts (nama -> jumlah baris)."""
+    year = _year_from_file_path(file_path)
+    for name, count in list(_SUPPLIER_INDEX['by_year'].get(year, {}).items()):
+        _supplier_index_adjust(year, name, -count)
+    for name, count in counts.items():
+        _supplier_index_adjust(year, name, count)
+    _SUPPLIER_INDEX['months'][year] = dict(month_counts)
+    _SUPPLIER_INDEX['signatures'][file_path] = _data_signature(file_path)
+
+def _refresh_supplier_index():
+    """Menyinkronkan indeks dengan file yang berubah di luar proses ini (mis. worker lain)."""
+    all_files = set(list_data_files())
+    with _SUPPLIER_INDEX_LOCK:
+        for file_path in set(_SUPPLIER_INDEX['signatures']) - all_files:
+            _supplier_index_set_year(file_path, {}, {})
+            _SUPPLIER_INDEX['signatures'].pop(file_path, None)
+        for file_path in all_files:
+            if _SUPPLIER_INDEX['signatures'].get(file_path) != _data_signature(file_path):
+                _supplier_index_set_year(file_path, year_supplier_counts(file_path), year_month_counts(file_path))
+        _SUPPLIER_INDEX['built'] = True
+
+def supplier_index_record_write(file_path, supplier_name=None, delta=0, counts=None, month=None, month_counts=None):
+    """Dipanggil setelah penulisan berhasil agar indeks tidak perlu membaca ulang file.
+
+    Berikan counts + month_counts (lihat supplier_counts / supplier_month_counts)
+    untuk mengganti kontribusi seluruh tahun (mis. setelah upload), atau
+    supplier_name + delta (+ month, CLOSING MONTH baris itu) untuk satu baris.
+    """
+    with _SUPPLIER_INDEX_LOCK:
+        if not _SUPPLIER_INDEX['built']:
+            return
+        if counts is not None:
+            _supplier_index_set_year(file_path, counts, month_counts)
+            return
+        if supplier_name is not None and delta:
+            year = _year_from_file_path(file_path)
+            _supplier_index_adjust(year, supplier_name, delta)
+            if month is not None:
+                _supplier_index_adjust_month(year, supplier_name, month, delta)
+        _SUPPLIER_INDEX['signatures'][file_path] = _data_signature(file_path)
+
+def get_supplier_names():
+    """Daftar nama supplier terurut, tanpa membaca file data."""
+    _refresh_supplier_index()
+    with _SUPPLIER_INDEX_LOCK:
+        if _SUPPLIER_INDEX['sorted'] is None:
+            names = set()
+            for counts in _SUPPLIER_INDEX['by_year'].values():
+                names.update(counts)
+            _SUPPLIER_INDEX['sorted'] = sorted(names)
+        return list(_SUPPLIER_INDEX['sorted'])
+
+def find_supplier(name, year=None):
+    """Mencari supplier (case-insensitive, O(1)). Mengembalikan nama asli atau None."""
+    _refresh_supplier_index()
+    with _SUPPLIER_INDEX_LOCK:
+        names = _SUPPLIER_INDEX['normalized'].get(normalize_supplier_name(name))
+        if not names:
+            return None
+        if year is not None:
+            year_counts = _SUPPLIER_INDEX['by_year'].get(year, {})
+            names = [n for n in names if n in year_counts]
+            if not names:
+                return None
+        return min(names)
+
+def supplier_has_month(name, month):
+    """True jika supplier (case-insensitive) sudah punya data di bulan month, tanpa membaca file data."""
+    _refresh_supplier_index()
+    month = pd.Timestamp(month)
+    with _SUPPLIER_INDEX_LOCK:
+        return _SUPPLIER_INDEX['months'].get(month.year, {}).get(_month_key(name, month), 0) > 0
+
+def get_supplier_stats(name):
+    """Jumlah baris dan rentang tahun untuk satu supplier, atau None jika tidak ada."""
+    canonical = find_supplier(name)
+    if canonical is None:
+        return None
+    with _SUPPLIER_INDEX_LOCK:
+        per_year = {year: counts[canonical] for year, counts in _SUPPLIER_INDEX['by_year'].items() if canonical in counts}
+    return {'name': canonical, 'rows': sum(per_year.values()),
+            'first_year': min(per_year), 'last_year': max(per_year)}
+
+# --- Rollup KPI per Supplier ---
+# Dibangun sekali per versi data (lihat get_data_version) lalu dipakai ulang oleh
+# dashboard dan API, sehingga tidak ada filter/parsing tanggal per request.
+# Setiap build menghasilkan snapshot baru yang tidak diubah lagi (mapping read-only,
+# history tidak pernah ditulis); referensinya diganti di bawah lock. Pembaca cukup
+# mengambil satu referensi lokal agar version, positions, totals dan history selalu
+# berasal dari build yang sama.
+_ROLLUP_CACHE = None
+_ROLLUP_LOCK = threading.Lock()
+
+def get_data_version():
+    """Versi data saat ini: signature semua file data (berubah setiap ada penulisan)."""
+    all_files = list_data_files()
+    return tuple((fp, _data_signature(fp)) for fp in all_files)
+
+def _build_rollups(df):
+    """Menghitung riwayat terurut dan total KPI untuk semua supplier sekaligus."""
+    if df.empty or 'SUPPLIER NAME' not in df.columns:
+        return pd.DataFrame(), {}, {}
+    df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
+    history = df.sort_values('CLOSING MONTH', kind='stable').reset_index(drop=True)
+    history['_on_target'] = history['ACHIEVEMENT'] >= history['TARGET DELIVERY']
+    grouped = history.groupby('SUPPLIER NAME', sort=False)
+    totals = grouped.agg(
+        total_purchase=('Purchase Amount', 'sum'),
+        avg_achievement=('ACHIEVEMENT', 'mean'),
+        total_delivery=('TOTAL DELIVERY ITEM', 'sum'),
+        total_on_time=('ON TIME', 'sum'),
+        on_target_ratio=('_on_target', 'mean'),
+        months=('CLOSING MONTH', 'count'),
+        first_month=('CLOSING MONTH', 'min'),
+        last_month=('CLOSING MONTH', 'max'),
+    )
+    totals['on_time_ratio'] = totals['total_on_time'] / totals['total_delivery'].where(totals['total_delivery'] > 0)
+    history = history.drop(columns=['_on_target'])
+    positions = {name: idx for name, idx in grouped.indices.items()}
+    return history, positions, totals.to_dict(orient='index')
+
+def _get_rollups():
+    """Snapshot rollup (read-only) untuk versi data saat ini, dibangun ulang jika data berubah."""
+    global _ROLLUP_CACHE
+    version = get_data_version()
+    with _ROLLUP_LOCK:
+        rollups = _ROLLUP_CACHE
+    hit = rollups is not None and rollups['version'] == version
+    _count_cache('rollup', hit)
+    if hit:
+        return rollups
+    df = load_all_data()
+    with _timed('rollup_build'):
+        history, positions, totals = _build_rollups(df)
+    rollups = types.MappingProxyType({
+        'version': version,
+        'history': history,
+        'positions': types.MappingProxyType(positions),
+        'totals': types.MappingProxyType({name: types.MappingProxyType(values) for name, values in totals.items()}),
+    })
+    with _ROLLUP_LOCK:
+        _ROLLUP_CACHE = rollups
+    return rollups
+
+def get_supplier_rollup(supplier_name, rollups=None):
+    """Rollup satu supplier: riwayat bulanan (terurut) dan total KPI. None jika tidak ada.
+
+    rollups: snapshot dari _get_rollups() bila pemanggil sudah memegangnya.
+    """
+    if rollups is None:
+        rollups = _get_rollups()
+    idx = rollups['positions'].get(supplier_name)
+    if idx is None:
+        return None
+    return {'history': rollups['history'].iloc[idx].copy(),
+            'totals': rollups['totals'][supplier_name],
+            'version': rollups['version']}
+
+def format_kpi(totals):
+    """Format tampilan KPI dashboard dari total rollup."""
+    avg_achievement = totals['avg_achievement'] * 100
+    return {'total_purchase': f"Rp {totals['total_purchase']:,.0f}".replace(',', '.'), 
+            'avg_achievement': f"{avg_achievement:.2f}%" if not pd.isna(avg_achievement) else "N/A", # Handle NaN
+            'total_delivery': f"{int(totals['total_delivery'])} pcs"}
+
+# --- API Data Supplier (JSON) ---
+# Baris dikembalikan dari bulan terbaru (CLOSING MONTH, lalu row_id, menurun);
+# deret waktu dari bulan terlama (menaik). Baris tanpa CLOSING MONTH selalu di
+# akhir. Cursor menyimpan kunci baris terakhir halaman sebelumnya (keyset
+# pagination), jadi halaman berikutnya tidak bergeser walaupun ada baris baru.
+API_ROW_FIELDS = ['row_id', 'CLOSING MONTH', 'TOTAL DELIVERY ITEM', 'ON TIME', 'MINUS',
+                  'ACHIEVEMENT', 'TARGET DELIVERY', 'Purchase Amount']
+API_SERIES_FIELDS = ['CLOSING MONTH', 'TOTAL DELIVERY ITEM', 'ON TIME', 'ACHIEVEMENT',
+                     'TARGET DELIVERY', 'Purchase Amount']
+
+def parse_month_range(start=None, end=None):
+    """'YYYY-MM' -> (awal bulan start, awal bulan SETELAH end); None jika tidak diisi."""
+    try:
+        start_ts = pd.Timestamp(datetime.strptime(start, '%Y-%m')) if start else None
+        end_ts = pd.Timestamp(datetime.strptime(end, '%Y-%m')) + pd.DateOffset(months=1) if end else None
+    except ValueError:
+        raise ValueError('start/end must use the YYYY-MM format.')
+    return start_ts, end_ts
+
+def filter_month_range(df, start=None, end=None):
+    """Baris dengan start <= CLOSING MONTH < end (batas dari parse_month_range)."""
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['CLOSING MONTH'] >= start
+    if end is not None:
+        mask &= df['CLOSING MONTH'] < end
+    return df[mask]
+
+def parse_fields(value, columns, default):
+    """Daftar kolom dari parameter 'fields' (dipisah koma), divalidasi terhadap kolom data."""
+    fields = [f.strip() for f in value.split(',') if f.strip()] if value else [f for f in default if f in columns]
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+def encode_cursor(month, row_id):
+    month = None if pd.isna(month) else month.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([month, int(row_id)]).encode()).decode()
+
+def decode_cursor(cursor):
+    """Cursor -> (CLOSING MONTH atau NaT, row_id) baris terakhir halaman sebelumnya."""
+    try:
+        month, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (pd.NaT if month is None else pd.Timestamp(month)), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor.')
+
+def _api_value(value):
+    """Nilai sel untuk respons JSON (bulan sebagai 'YYYY-MM', NaN sebagai null)."""
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return None if pd.isna(value) else value.strftime('%Y-%m')
+    return _journal_encode(value)
+
+def keyset_page(rows, cursor=None, limit=50, ascending=False):
+    """Satu halaman rows urut (CLOSING MONTH, row_id), baris tanpa bulan di akhir. Mengembalikan (page, next_cursor)."""
+    rows = rows.sort_values(['CLOSING MONTH', 'row_id'], ascending=ascending, kind='stable', na_position='last')
+    if cursor is not None:
+        month, row_id = cursor
+        months = rows['CLOSING MONTH']
+        undated = months.isna()
+        after_id = rows['row_id'] > row_id if ascending else rows['row_id'] < row_id
+        if pd.isna(month):
+            rows = rows[undated & after_id]
+        else:
+            after_month = months > month if ascending else months < month
+            rows = rows[undated | after_month | ((months == month) & after_id)]
+    page = rows.iloc[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page.iloc[-1]
+        next_cursor = encode_cursor(last['CLOSING MONTH'], last['row_id'])
+    return page, next_cursor
+
+def query_supplier_rows(history, fields, start=None, end=None, cursor=None, limit=50):
+    """Satu halaman riwayat supplier, terbaru dulu. Mengembalikan (rows, next_cursor)."""
+    page, next_cursor = keyset_page(filter_month_range(history, start, end), cursor, limit)
+    records = [{field: _api_value(val) for field, val in zip(fields, values)}
+               for values in page[fields].itertuples(index=False, name=None)]
+    return records, next_cursor
+
 # --- Fungsi Grafik ---
-# (Tidak ada perubahan di fungsi grafik)
-def create_performance_chart(df):
-    if df.empty or 'CLOSING MONTH' not in df.columns: return json.dumps({})
+# Grafik dibangun langsung sebagai dict spesifikasi Plotly (tanpa membuat dan
+# memvalidasi objek go.Figure), lalu di-cache per supplier + versi data.
+# Hanya API publik Plotly yang dipakai; kesetaraan JSON-nya dengan versi
+# go.Figure diuji di tests/test_charts.py.
+_PLOTLY_TEMPLATE = {}
+
+def _default_template():
+    """Template layout default yang disisipkan Plotly ke setiap Figure (dihitung sekali)."""
+    if 'layout' not in _PLOTLY_TEMPLATE:
+        _PLOTLY_TEMPLATE['layout'] = go.Figure().to_dict()['layout'].get('template')
+    return _PLOTLY_TEMPLATE['layout']
+
+def _chart_json(data, layout):
+    """Serialisasi spesifikasi grafik dengan PlotlyJSONEncoder, dengan template default seperti go.Figure.
+
+    Array numpy ditulis sebagai list JSON biasa (go.Figure di Plotly 6 memakai
+    typed array base64); Plotly.js membaca keduanya sama.
+    """
+    template = _default_template()
+    if template is not None:
+        layout = {'template': template, **layout}
+    return json.dumps({'data': data, 'layout': layout}, cls=plotly.utils.PlotlyJSONEncoder)
+
+def _prepare_chart_data(df):
     df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
     df = df.sort_values('CLOSING MONTH')
-    month_labels = df['CLOSING MONTH'].dt.strftime('%B %Y')
-    fig = go.Figure()
-    fig.add_trace(go.Bar(x=month_labels, y=df['TOTAL DELIVERY ITEM'], name='Total Delivery (Bar)', marker_color='#C50000'))
-    fig.add_trace(go.Bar(x=month_labels, y=df['ON TIME'], name='On Time (Bar)', marker_color='#28a745'))
-    fig.add_trace(go.Scatter(x=month_labels, y=df['TOTAL DELIVERY ITEM'], name='Total Delivery (Line)', mode='lines+markers', line=dict(color="#ff6600", width=3, dash='dash')))
-    fig.add_trace(go.Scatter(x=month_labels, y=df['ON TIME'], name='On Time (Line)', mode='lines+markers', line=dict(color='#72e08a', width=3, dash='dash')))
-    fig.update_layout(title_text="<b>Delivery and On-Time Performance (All Years)</b>", title_font_color='black', barmode='group', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(color='black')), plot_bgcolor="#FFFFFF", paper_bgcolor="#FFFFFF", font=dict(family="Poppins, sans-serif", color='black'), hovermode='x unified', height=500, xaxis=dict(showgrid=True, gridcolor="#DDDDDD", tickfont=dict(color='black')), yaxis=dict(title_text="Jumlah (pcs)", gridcolor='#DDDDDD', tickfont=dict(color='black'), title_font_color='black')) # Grid color softer
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    return df, df['CLOSING MONTH'].dt.strftime('%B %Y').tolist()
+
+def create_performance_chart(df):
+    if df.empty or 'CLOSING MONTH' not in df.columns: return json.dumps({})
+    df, month_labels = _prepare_chart_data(df)
+    total_delivery = df['TOTAL DELIVERY ITEM'].to_numpy()
+    on_time = df['ON TIME'].to_numpy()
+    data = [
+        {'marker': {'color': '#C50000'}, 'name': 'Total Delivery (Bar)', 'x': month_labels, 'y': total_delivery, 'type': 'bar'},
+        {'marker': {'color': '#28a745'}, 'name': 'On Time (Bar)', 'x': month_labels, 'y': on_time, 'type': 'bar'},
+        {'line': {'color': '#ff6600', 'dash': 'dash', 'width': 3}, 'mode': 'lines+markers', 'name': 'Total Delivery (Line)', 'x': month_labels, 'y': total_delivery, 'type': 'scatter'},
+        {'line': {'color': '#72e08a', 'dash': 'dash', 'width': 3}, 'mode': 'lines+markers', 'name': 'On Time (Line)', 'x': month_labels, 'y': on_time, 'type': 'scatter'},
+    ]
+    # Urutan key mengikuti output go.Figure
+    layout = {'title': {'font': {'color': 'black'}, 'text': "<b>Delivery and On-Time Performance (All Years)</b>"}, 'legend': {'font': {'color': 'black'}, 'orientation': "h", 'yanchor': "bottom", 'y': 1.02, 'xanchor': "right", 'x': 1}, 'font': {'family': "Poppins, sans-serif", 'color': 'black'}, 'xaxis': {'tickfont': {'color': 'black'}, 'showgrid': True, 'gridcolor': "#DDDDDD"}, 'yaxis': {'title': {'font': {'color': 'black'}, 'text': "Jumlah (pcs)"}, 'tickfont': {'color': 'black'}, 'gridcolor': '#DDDDDD'}, 'barmode': 'group', 'plot_bgcolor': "#FFFFFF", 'paper_bgcolor': "#FFFFFF", 'hovermode': 'x unified', 'height': 500} # Grid color softer
+    return _chart_json(data, layout)
 
 def create_purchasing_chart(df):
     if df.empty or 'CLOSING MONTH' not in df.columns: return json.dumps({})
-    df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
-    df = df.sort_values('CLOSING MONTH')
-    month_labels = df['CLOSING MONTH'].dt.strftime('%B %Y')
-    fig = go.Figure(go.Scatter(x=month_labels, y=df['Purchase Amount'], name='Purchasing Amount', mode='lines+markers', line=dict(color='#0d6efd', width=4, shape='spline'), fill='tozeroy', fillcolor='rgba(13, 110, 253, 0.2)'))
-    fig.update_layout(title_text="<b>Monthly Purchasing Amount (All Years)</b>", title_font_color='black', plot_bgcolor="#FFFFFF", paper_bgcolor="#FFFFFF", font=dict(family="Poppins, sans-serif", color='black'), yaxis_title="<b>Purchase Amount (Rp)</b>", yaxis_title_font_color='black', hovermode='x unified', height=500)
-    fig.update_yaxes(gridcolor="#DDDDDD", tickfont=dict(color='black')) # Grid color softer
-    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    df, month_labels = _prepare_chart_data(df)
+    data = [{'fill': 'tozeroy', 'fillcolor': 'rgba(13, 110, 253, 0.2)', 'line': {'color': '#0d6efd', 'shape': 'spline', 'width': 4}, 'mode': 'lines+markers', 'name': 'Purchasing Amount', 'x': month_labels, 'y': df['Purchase Amount'].to_numpy(), 'type': 'scatter'}]
+    layout = {'title': {'font': {'color': 'black'}, 'text': "<b>Monthly Purchasing Amount (All Years)</b>"}, 'font': {'family': "Poppins, sans-serif", 'color': 'black'}, 'yaxis': {'title': {'text': "<b>Purchase Amount (Rp)</b>", 'font': {'color': 'black'}}, 'tickfont': {'color': 'black'}, 'gridcolor': "#DDDDDD"}, 'plot_bgcolor': "#FFFFFF", 'paper_bgcolor': "#FFFFFF", 'hovermode': 'x unified', 'height': 500} # Grid color softer
+    return _chart_json(data, layout)
+
+# --- Cache Grafik ---
+class LRUCache:
+    """Cache LRU sederhana dengan batas memori (ukuran tiap nilai dihitung oleh sizeof)."""
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+_CHART_CACHE = None
+
+def _get_chart_cache():
+    global _CHART_CACHE
+    if _CHART_CACHE is None:
+        _CHART_CACHE = LRUCache(app.config['CHART_CACHE_MAX_BYTES'], sizeof=lambda charts: sum(len(c) for c in charts))
+    return _CHART_CACHE
+
+def get_supplier_charts(supplier_name, rollup):
+    """JSON kedua grafik dashboard untuk satu supplier, di-cache per versi data."""
+    cache = _get_chart_cache()
+    key = (supplier_name, rollup['version'])
+    charts = cache.get(key)
+    if charts is None:
+        with _timed('chart_build'):
+            charts = (create_performance_chart(rollup['history']), create_purchasing_chart(rollup['history']))
+        cache.set(key, charts)
+    return charts
+
+# --- Leaderboard Supplier ---
+# Agregat semua supplier untuk satu periode dihitung sekali (groupby vektor di
+# atas riwayat rollup) dan di-cache per (versi data, start, end); pengurutan
+# dan pemotongan per permintaan cukup murah walau ada ribuan supplier.
+LEADERBOARD_METRICS = ['on_time_ratio', 'avg_achievement', 'achievement_gap', 'on_target_ratio',
+                       'total_minus', 'total_purchase', 'total_delivery', 'months']
+_LEADERBOARD_CACHE = None
+
+def _get_leaderboard_cache():
+    global _LEADERBOARD_CACHE
+    if _LEADERBOARD_CACHE is None:
+        _LEADERBOARD_CACHE = LRUCache(app.config['LEADERBOARD_CACHE_MAX_BYTES'],
+                                      sizeof=lambda df: int(df.memory_usage(index=True, deep=True).sum()))
+    return _LEADERBOARD_CACHE
+
+def _build_leaderboard(history, start=None, end=None):
+    """Agregat KPI per supplier untuk periode start..end (batas dari parse_month_range)."""
+    history = filter_month_range(history, start, end) if not history.empty else history
+    if history.empty:
+        return pd.DataFrame(columns=['supplier_name'] + LEADERBOARD_METRICS)
+    frame = history[['SUPPLIER NAME', 'CLOSING MONTH', 'TOTAL DELIVERY ITEM', 'ON TIME', 'MINUS',
+                     'ACHIEVEMENT', 'TARGET DELIVERY', 'Purchase Amount']].copy()
+    frame['_on_target'] = frame['ACHIEVEMENT'] >= frame['TARGET DELIVERY']
+    board = frame.groupby('SUPPLIER NAME', sort=False).agg(
+        months=('CLOSING MONTH', 'count'),
+        total_delivery=('TOTAL DELIVERY ITEM', 'sum'),
+        total_on_time=('ON TIME', 'sum'),
+        avg_achievement=('ACHIEVEMENT', 'mean'),
+        avg_target=('TARGET DELIVERY', 'mean'),
+        on_target_ratio=('_on_target', 'mean'),
+        total_minus=('MINUS', 'sum'),
+        total_purchase=('Purchase Amount', 'sum'),
+    )
+    board['on_time_ratio'] = board['total_on_time'] / board['total_delivery'].where(board['total_delivery'] > 0)
+    board['achievement_gap'] = board['avg_achievement'] - board['avg_target']
+    return board.rename_axis('supplier_name').reset_index()
+
+def get_leaderboard(start=None, end=None, sort='on_time_ratio', ascending=True, limit=None):
+    """Peringkat supplier untuk periode start..end, diurutkan menurut metrik sort.
+
+    Mengembalikan list dict (dengan 'rank'); supplier tanpa nilai metrik ditaruh di akhir.
+    """
+    if sort not in LEADERBOARD_METRICS:
+        raise ValueError(f"sort must be one of: {', '.join(LEADERBOARD_METRICS)}")
+    rollups = _get_rollups()
+    cache = _get_leaderboard_cache()
+    key = (rollups['version'], start, end)
+    board = cache.get(key)
+    if board is None:
+        with _timed('leaderboard_build'):
+            board = _build_leaderboard(rollups['history'], start, end)
+        cache.set(key, board)
+    ranked = board.sort_values([sort, 'supplier_name'], ascending=[ascending, True], na_position='last', kind='stable')
+    if limit is not None:
+        ranked = ranked.iloc[:limit]
+    records = [{col: _api_value(val) for col, val in zip(ranked.columns, values)}
+               for values in ranked.itertuples(index=False, name=None)]
+    for rank, record in enumerate(records, start=1):
+        record['rank'] = rank
+    return records
+
+# --- Upload Massal ---
+# File upload dibaca baris per baris (openpyxl read-only) dan langsung dipisah
+# per tahun, lalu setiap tahun digabung dengan file yang ada secara paralel di
+# process pool.
+_UPLOAD_POOL = None
+
+def _get_upload_pool():
+    global _UPLOAD_POOL
+    if _UPLOAD_POOL is None:
+        # 'spawn' agar worker tidak mewarisi lock yang sedang dipegang thread lain
+        _UPLOAD_POOL = ProcessPoolExecutor(max_workers=app.config['UPLOAD_MERGE_WORKERS'],
+                                           mp_context=multiprocessing.get_context('spawn'))
+    return _UPLOAD_POOL
+
+def read_upload_by_year(file_obj):
+    """Membaca file .xlsx upload secara streaming dan mengelompokkan baris per tahun.
+
+    Mengembalikan (columns, {tahun: [baris, ...]}, jumlah baris tanpa CLOSING MONTH).
+    """
+    wb = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        if 'CLOSING MONTH' not in columns or 'SUPPLIER NAME' not in columns:
+            raise ValueError('Uploaded file must contain "CLOSING MONTH" and "SUPPLIER NAME" columns.')
+        month_idx = columns.index('CLOSING MONTH')
+        partitions = {}
+        skipped = 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            month = row[month_idx] if month_idx < len(row) else None
+            if month is None or month == '':
+                skipped += 1
+                continue
+            year = month.year if isinstance(month, datetime) else pd.Timestamp(month).year
+            partitions.setdefault(year, []).append(row)
+    finally:
+        wb.close()
+    return columns, partitions, skipped
+
+def merge_year_upload(file_path, columns, rows):
+    """Menggabungkan baris upload satu tahun ke file tahunan (dijalankan di worker process).
+
+    Baris dengan SUPPLIER NAME + CLOSING MONTH yang sama diganti oleh data upload.
+    """
+    start = time.perf_counter()
+    df_new_for_year = pd.DataFrame(rows, columns=columns)
+    df_new_for_year['CLOSING MONTH'] = pd.to_datetime(df_new_for_year['CLOSING MONTH'])
+    with _year_lock(file_path):
+        # Dibaca dengan _load_year: jika file gagal dibaca, merge gagal dan file tidak ditimpa
+        df_existing = _load_year(file_path)[1].drop(columns=['row_id'], errors='ignore')
+        # Penting: Pastikan kolom tanggal di df_existing juga datetime
+        if not df_existing.empty and 'CLOSING MONTH' in df_existing.columns:
+            df_existing['CLOSING MONTH'] = pd.to_datetime(df_existing['CLOSING MONTH'])
+        df_combined = pd.concat([df_existing, df_new_for_year], ignore_index=True)
+        df_combined.drop_duplicates(subset=['SUPPLIER NAME', 'CLOSING MONTH'], keep='last', inplace=True)
+        _write_data_file(df_combined, file_path)
+    return {'file': os.path.basename(file_path), 'file_path': file_path,
+            'year': _year_from_file_path(file_path),
+            'rows_uploaded': len(df_new_for_year), 'rows_total': len(df_combined),
+            'seconds': time.perf_counter() - start,
+            'supplier_counts': supplier_counts(df_combined),
+            'month_counts': supplier_month_counts(df_combined)}
+
+def ingest_upload(file_obj, progress=None):
+    """Memproses satu file upload: parse streaming lalu merge per tahun (paralel jika > 1 tahun).
+
+    progress(fraction, message) dipanggil setelah parse dan setiap tahun selesai.
+    Mengembalikan dict berisi waktu parse, jumlah baris yang dilewati, dan hasil per tahun.
+    """
+    progress = progress or (lambda fraction, message: None)
+    start = time.perf_counter()
+    progress(0.0, 'Reading uploaded file...')
+    with _timed('upload_parse'):
+        columns, partitions, skipped = read_upload_by_year(file_obj)
+    parse_seconds = time.perf_counter() - start
+    jobs = [(get_data_file_path(year), columns, rows) for year, rows in sorted(partitions.items())]
+    progress(0.1, f'Parsed {sum(len(rows) for rows in partitions.values())} rows for {len(jobs)} year(s).')
+
+    def record(result):
+        # File mungkin ditulis di process lain: buang cache lokal dan perbarui indeks supplier
+        file_path = result.pop('file_path')
+        invalidate_data_cache(file_path)
+        supplier_index_record_write(file_path, counts=result.pop('supplier_counts'), month_counts=result.pop('month_counts'))
+        results.append(result)
+        progress(0.1 + 0.9 * len(results) / len(jobs), f'Merged {result["file"]} ({len(results)}/{len(jobs)}).')
+
+    results = []
+    with _timed('upload_merge'):
+        if len(jobs) > 1 and app.config['UPLOAD_MERGE_WORKERS'] > 1:
+            pool = _get_upload_pool()
+            for future in as_completed([pool.submit(merge_year_upload, *job) for job in jobs]):
+                record(future.result())
+            results.sort(key=lambda result: result['year'])
+        else:
+            for job in jobs:
+                record(merge_year_upload(*job))
+    _count('rows_uploaded_total', sum(len(rows) for rows in partitions.values()))
+    return {'parse_seconds': parse_seconds, 'skipped_rows': skipped, 'years': results,
+            'total_seconds': time.perf_counter() - start}
+
+def format_upload_report(report):
+    """Ringkasan hasil ingest_upload untuk ditampilkan ke pengguna."""
+    if not report['years']:
+        return 'No data was processed. Check file format or content.'
+    details = "; ".join(f"{r['file']}: {r['rows_uploaded']} rows uploaded, {r['rows_total']} total ({r['seconds']:.2f}s)"
+                        for r in report['years'])
+    message = (f'Data successfully processed in {report["total_seconds"]:.2f}s '
+               f'(parse {report["parse_seconds"]:.2f}s) — {details}')
+    if report['skipped_rows']:
+        message += f'. {report["skipped_rows"]} row(s) without "CLOSING MONTH" were skipped.'
+    return message
+
+# --- Ekspor Laporan ---
+# Ekspor lintas tahun diproses file tahunan demi file tahunan lewat generator,
+# jadi gabungan semua tahun tidak pernah dibuat di memori. CSV dikirim per
+# potongan baris; XLSX ditulis dengan openpyxl write-only ke file sementara lalu
+# dikirim per blok.
+EXPORT_CSV_CHUNK_ROWS = 5000
+EXPORT_STREAM_BLOCK_BYTES = 64 * 1024
+
+def plan_export(start=None, end=None):
+    """(kolom header, file tahunan) untuk ekspor periode ini, dihitung sebelum respons dimulai.
+
+    Header adalah gabungan kolom semua tahun (urutan kemunculan), diambil dari
+    skema tiap tahun tanpa membaca datanya, jadi sama untuk setiap periode dan
+    tetap ada walaupun tidak ada baris. Tahun yang skemanya gagal dibaca
+    dilewati seluruhnya, jadi datanya juga tidak ikut diekspor.
+    """
+    columns, file_paths = [], []
+    for file_path in list_data_files():
+        try:
+            columns += [col for col in year_columns(file_path) if col not in columns]
+        except Exception as e:
+            print(f"Error reading columns from {file_path}: {e}")
+            continue
+        # Lewati file yang tahunnya di luar periode tanpa membacanya
+        year = _year_from_file_path(file_path)
+        if not (start is not None and year < start.year) and not (end is not None and pd.Timestamp(year, 1, 1) >= end):
+            file_paths.append(file_path)
+    return columns, file_paths
+
+def iter_export_frames(columns, file_paths, supplier_name=None, start=None, end=None):
+    """DataFrame per tahun (kolom header dari plan_export, tanpa row_id) untuk supplier/periode yang diminta.
+
+    Kolom yang tidak ada di suatu tahun dibiarkan kosong.
+    """
+    for file_path in file_paths:
+        # Tahun yang belum ada di cache dibaca tanpa disimpan, agar memori tidak tumbuh dengan jumlah tahun
+        with _DATA_CACHE_LOCK:
+            cached = _DATA_CACHE.get(file_path)
+        if cached is not None and cached[0] == _data_signature(file_path):
+            df = cached[1]
+        else:
+            try:
+                df = _read_data_file(file_path)
+            except Exception as e:
+                # Sama seperti _load_data_cached: tahun yang gagal dibaca dilewati
+                print(f"Error loading data from {file_path}: {e}")
+                continue
+        if df.empty:
+            continue
+        if supplier_name is not None:
+            df = df[df['SUPPLIER NAME'] == supplier_name]
+        df = filter_month_range(df, start, end)
+        if not df.empty:
+            missing = [col for col in df.columns if col != 'row_id' and col not in columns]
+            if missing:
+                # Hanya jika file diubah setelah plan_export: jangan diam-diam membuang kolom
+                raise ValueError(f"{os.path.basename(file_path)} changed during the export: "
+                                 f"columns {missing} are missing from the export header.")
+            yield df.reindex(columns=columns)
+
+def _excel_value(value):
+    """Nilai sel pandas/numpy -> nilai Python yang bisa ditulis openpyxl."""
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.to_pydatetime()
+    return _journal_encode(value)
+
+def iter_csv_export(columns, frames):
+    """Potongan teks CSV; header selalu ditulis sekali di awal, juga jika tidak ada baris."""
+    if columns:
+        yield pd.DataFrame(columns=columns).to_csv(index=False)
+    rows = 0
+    for df in frames:
+        for offset in range(0, len(df), EXPORT_CSV_CHUNK_ROWS):
+            chunk = df.iloc[offset:offset + EXPORT_CSV_CHUNK_ROWS]
+            yield chunk.to_csv(index=False, header=False, date_format='%Y-%m-%d')
+            rows += len(chunk)
+    _count('rows_exported_total', rows, format='csv')
+
+def iter_xlsx_export(columns, frames):
+    """Blok byte file .xlsx yang ditulis dengan openpyxl write-only (memori tetap kecil)."""
+    fd, tmp_path = tempfile.mkstemp(suffix='.xlsx', prefix='export_')
+    os.close(fd)
+    try:
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet('Export')
+        if columns:
+            ws.append(columns)
+        rows = 0
+        for df in frames:
+            for values in df.itertuples(index=False, name=None):
+                ws.append([_excel_value(value) for value in values])
+            rows += len(df)
+        wb.save(tmp_path)
+        _count('rows_exported_total', rows, format='xlsx')
+        with open(tmp_path, 'rb') as f:
+            while True:
+                block = f.read(EXPORT_STREAM_BLOCK_BYTES)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(tmp_path)
+
+# --- Antrian Job Background ---
+# Upload besar diproses oleh worker thread lokal agar thread request tetap bebas
+# untuk dashboard. Status job disimpan di tabel _JOBS dan bisa dipantau lewat
+# /jobs/<job_id>.
+# _JOBS hanya ada di memori proses yang menerima upload: dengan beberapa proses
+# worker (mis. gunicorn -w N) /jobs/<job_id> bisa dijawab proses lain dan
+# mengembalikan 404, begitu juga setelah restart. Jalankan dengan satu proses
+# (thread boleh banyak) atau arahkan klien ke proses yang sama (sticky session).
+_JOBS = OrderedDict()
+_JOBS_LOCK = threading.Lock()
+_JOB_EXECUTOR = None
+MAX_FINISHED_JOBS = 100
+
+def _get_job_executor():
+    global _JOB_EXECUTOR
+    if _JOB_EXECUTOR is None:
+        _JOB_EXECUTOR = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'], thread_name_prefix='job')
+    return _JOB_EXECUTOR
+
+def _update_job(job_id, **fields):
+    with _JOBS_LOCK:
+        _JOBS[job_id].update(fields)
+
+def get_job(job_id):
+    """Salinan status job, atau None jika job tidak dikenal."""
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        return dict(job) if job is not None else None
+
+def submit_job(kind, fn, *args):
+    """Menjalankan fn(*args, progress=...) di background dan mengembalikan job_id.
+
+    fn harus mengembalikan (message, result); result disimpan di status job.
+    """
+    job_id = uuid.uuid4().hex
+    with _JOBS_LOCK:
+        _JOBS[job_id] = {'id': job_id, 'kind': kind, 'status': 'queued', 'progress': 0.0,
+                         'message': 'Waiting for a worker...', 'result': None, 'error': None,
+                         'created_at': datetime.now().isoformat(timespec='seconds'),
+                         'started_at': None, 'finished_at': None}
+        # Buang job lama yang sudah selesai
+        finished = [jid for jid, job in _JOBS.items() if job['status'] in ('done', 'failed')]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _JOBS[jid]
+
+    def progress(fraction, message):
+        _update_job(job_id, progress=round(fraction, 3), message=message)
+
+    def run():
+        _update_job(job_id, status='running', started_at=datetime.now().isoformat(timespec='seconds'))
+        try:
+            message, result = fn(*args, progress=progress)
+            _update_job(job_id, status='done', progress=1.0, message=message, result=result)
+        except Exception as e:
+            _update_job(job_id, status='failed', message=f"Failed to process file. Error: {e}", error=str(e))
+        finally:
+            _update_job(job_id, finished_at=datetime.now().isoformat(timespec='seconds'))
+
+    _get_job_executor().submit(run)
+    return job_id
+
+def _run_upload_job(upload_path, progress):
+    """Job upload: memproses file sementara lalu menghapusnya."""
+    try:
+        report = ingest_upload(upload_path, progress=progress)
+    finally:
+        os.remove(upload_path)
+    return format_upload_report(report), report
 
 # --- Rute Aplikasi ---
 @app.route('/')
 def index():
-    df = load_all_data()
-    suppliers = []
-    if not df.empty and 'SUPPLIER NAME' in df.columns:
-        suppliers = sorted(df['SUPPLIER NAME'].unique().tolist())
+    suppliers = get_supplier_names()
     return render_template('index.html', suppliers=suppliers)
 
 @app.route('/search', methods=['POST'])
@@ -108,25 +2058,137 @@ def search():
 
 @app.route('/dashboard/<supplier_name>')
 def dashboard(supplier_name):
-    df = load_all_data()
-    if df.empty: 
+    if not get_data_version(): 
         flash('No data files found. Please add data.', 'info')
         return redirect(url_for('index'))
-    df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
-    supplier_data = df[df['SUPPLIER NAME'] == supplier_name].sort_values('CLOSING MONTH')
-    if supplier_data.empty:
+    rollup = get_supplier_rollup(supplier_name)
+    if rollup is None:
         flash(f'Data for "{supplier_name}" not found.', 'warning')
         return redirect(url_for('index'))
-    total_purchase = supplier_data['Purchase Amount'].sum()
-    avg_achievement = supplier_data['ACHIEVEMENT'].mean() * 100
-    total_delivery = supplier_data['TOTAL DELIVERY ITEM'].sum()
-    kpi = {'total_purchase': f"Rp {total_purchase:,.0f}".replace(',', '.'), 
-           'avg_achievement': f"{avg_achievement:.2f}%" if not pd.isna(avg_achievement) else "N/A", # Handle NaN
-           'total_delivery': f"{int(total_delivery)} pcs"}
-    chart1_json = create_performance_chart(supplier_data)
-    chart2_json = create_purchasing_chart(supplier_data)
-    table_data = supplier_data.sort_values('CLOSING MONTH', ascending=False).to_dict(orient='records')
-    return render_template('dashboard.html', supplier_name=supplier_name, chart1_json=chart1_json, chart2_json=chart2_json, kpi=kpi, table_data=table_data)
+    kpi = format_kpi(rollup['totals'])
+    chart1_json, chart2_json = get_supplier_charts(supplier_name, rollup)
+    # Tabel diisi lewat /api/suppliers/<name>/rows (per halaman), tidak di-render di sini
+    return render_template('dashboard.html', supplier_name=supplier_name, chart1_json=chart1_json, chart2_json=chart2_json, kpi=kpi,
+                           page_size=app.config['API_PAGE_SIZE'])
+
+@app.route('/api/suppliers/<supplier_name>/kpi')
+def supplier_kpi_api(supplier_name):
+    rollup = get_supplier_rollup(supplier_name)
+    if rollup is None:
+        return jsonify({'error': f'Supplier "{supplier_name}" not found.'}), 404
+    history = rollup['history']
+    series = {
+        'month': history['CLOSING MONTH'].dt.strftime('%Y-%m').tolist(),
+        'total_delivery': history['TOTAL DELIVERY ITEM'].tolist(),
+        'on_time': history['ON TIME'].tolist(),
+        'achievement': history['ACHIEVEMENT'].tolist(),
+        'purchase_amount': history['Purchase Amount'].tolist(),
+    }
+    totals = {key: (None if pd.isna(val) else val.strftime('%Y-%m') if isinstance(val, pd.Timestamp) else _journal_encode(val))
+              for key, val in rollup['totals'].items()}
+    return jsonify({'supplier_name': supplier_name, 'totals': totals, 'monthly': series})
+
+@app.route('/api/suppliers/<supplier_name>/rows')
+def supplier_rows_api(supplier_name):
+    """Baris riwayat supplier per halaman: ?start=YYYY-MM&end=YYYY-MM&fields=a,b&limit=N&cursor=..."""
+    rollup = get_supplier_rollup(supplier_name)
+    if rollup is None:
+        return jsonify({'error': f'Supplier "{supplier_name}" not found.'}), 404
+    history = rollup['history']
+    args = request.args
+    try:
+        start, end = parse_month_range(args.get('start'), args.get('end'))
+        fields = parse_fields(args.get('fields'), history.columns, API_ROW_FIELDS)
+        cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['API_MAX_PAGE_SIZE']))
+    rows, next_cursor = query_supplier_rows(history, fields, start, end, cursor, limit)
+    return jsonify({'supplier_name': supplier_name, 'fields': fields, 'rows': rows, 'next_cursor': next_cursor})
+
+@app.route('/api/suppliers/<supplier_name>/series')
+def supplier_series_api(supplier_name):
+    """Deret waktu bulanan supplier (urut bulan) per kolom: ?start=YYYY-MM&end=YYYY-MM&fields=a,b&limit=N&cursor=..."""
+    rollup = get_supplier_rollup(supplier_name)
+    if rollup is None:
+        return jsonify({'error': f'Supplier "{supplier_name}" not found.'}), 404
+    history = rollup['history']
+    args = request.args
+    try:
+        start, end = parse_month_range(args.get('start'), args.get('end'))
+        fields = parse_fields(args.get('fields'), history.columns, API_SERIES_FIELDS)
+        cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Default halaman terbesar: satu panggilan biasanya cukup untuk satu grafik
+    limit = args.get('limit', app.config['API_MAX_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['API_MAX_PAGE_SIZE']))
+    page, next_cursor = keyset_page(filter_month_range(history, start, end), cursor, limit, ascending=True)
+    series = {field: [_api_value(val) for val in page[field].tolist()] for field in fields}
+    return jsonify({'supplier_name': supplier_name, 'points': len(page), 'series': series, 'next_cursor': next_cursor})
+
+def _leaderboard_args(args):
+    """Parameter leaderboard dari query string (start, end, sort, order, limit)."""
+    start, end = parse_month_range(args.get('start'), args.get('end'))
+    sort = args.get('sort', 'on_time_ratio')
+    order = args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be "asc" or "desc".')
+    limit = args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['API_MAX_PAGE_SIZE']))
+    return dict(start=start, end=end, sort=sort, ascending=(order == 'asc'), limit=limit)
+
+@app.route('/leaderboard')
+def leaderboard():
+    try:
+        params = _leaderboard_args(request.args)
+        rows = get_leaderboard(**params)
+    except ValueError as e:
+        flash(str(e), 'warning')
+        params, rows = _leaderboard_args(MultiDict()), []
+    return render_template('leaderboard.html', rows=rows, metrics=LEADERBOARD_METRICS, args=request.args,
+                           sort=params['sort'], order='asc' if params['ascending'] else 'desc', limit=params['limit'])
+
+@app.route('/api/leaderboard')
+def leaderboard_api():
+    """Peringkat supplier: ?start=YYYY-MM&end=YYYY-MM&sort=<metric>&order=asc|desc&limit=N"""
+    try:
+        params = _leaderboard_args(request.args)
+        rows = get_leaderboard(**params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'sort': params['sort'], 'order': 'asc' if params['ascending'] else 'desc',
+                    'count': len(rows), 'rows': rows})
+
+@app.route('/export')
+def export_report():
+    """Unduh laporan lintas tahun: ?format=csv|xlsx&supplier=<nama>&start=YYYY-MM&end=YYYY-MM"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': 'format must be "csv" or "xlsx".'}), 400
+    try:
+        start, end = parse_month_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    supplier_name = None
+    if request.args.get('supplier'):
+        supplier_name = find_supplier(request.args['supplier'])
+        if supplier_name is None:
+            return jsonify({'error': f'Supplier "{request.args["supplier"]}" not found.'}), 404
+
+    name_parts = ['supplier_report', secure_filename(supplier_name or '') or None,
+                  request.args.get('start'), request.args.get('end')]
+    filename = '_'.join(part for part in name_parts if part) + '.' + export_format
+    # Header dan skema ditentukan sebelum status 200 dan byte pertama dikirim
+    columns, file_paths = plan_export(start, end)
+    frames = iter_export_frames(columns, file_paths, supplier_name, start, end)
+    if export_format == 'csv':
+        body, mimetype = iter_csv_export(columns, frames), 'text/csv'
+    else:
+        body, mimetype = iter_xlsx_export(columns, frames), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @app.route('/update', methods=['GET', 'POST'])
 def update():
@@ -142,40 +2204,32 @@ def update():
         
         if file and file.filename.endswith('.xlsx'):
             try:
-                df_upload = pd.read_excel(file)
-                if 'CLOSING MONTH' not in df_upload.columns or 'SUPPLIER NAME' not in df_upload.columns:
-                     flash('Uploaded file must contain "CLOSING MONTH" and "SUPPLIER NAME" columns.', 'danger')
-                     return redirect(request.url)
-
-                df_upload['CLOSING MONTH'] = pd.to_datetime(df_upload['CLOSING MONTH'])
-                upload_years = df_upload['CLOSING MONTH'].dt.year.unique()
-                processed_files = []
-                
-                for year in upload_years:
-                    file_path = get_data_file_path(year)
-                    df_existing = load_data(file_path) 
-                    if 'row_id' in df_existing.columns:
-                         df_existing = df_existing.drop(columns=['row_id'])
-
-                    df_new_for_year = df_upload[df_upload['CLOSING MONTH'].dt.year == year]
-                    # Penting: Pastikan kolom tanggal di df_existing juga datetime
-                    if not df_existing.empty and 'CLOSING MONTH' in df_existing.columns:
-                       df_existing['CLOSING MONTH'] = pd.to_datetime(df_existing['CLOSING MONTH'])
-
-                    df_combined = pd.concat([df_existing, df_new_for_year], ignore_index=True)
-                    df_combined.drop_duplicates(subset=['SUPPLIER NAME', 'CLOSING MONTH'], keep='last', inplace=True)
-                    
-                    if save_data(df_combined, file_path):
-                         processed_files.append(os.path.basename(file_path))
-
-                if processed_files:
-                    flash(f'Data successfully processed for files: {", ".join(processed_files)}!', 'success')
-                else:
-                    flash('No data was processed. Check file format or content.', 'warning')
-                return redirect(url_for('index'))
+                # Simpan ke file sementara; pemrosesan dilakukan di worker background
+                fd, upload_path = tempfile.mkstemp(suffix='.xlsx', prefix='upload_')
+                with os.fdopen(fd, 'wb') as f:
+                    file.save(f)
+                job_id = submit_job('upload', _run_upload_job, upload_path)
             except Exception as e:
                 flash(f"Failed to process file. Error: {e}", 'danger')
-    return render_template('update.html')
+                return redirect(request.url)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+            return redirect(url_for('update', job=job_id))
+        flash('Only .xlsx files are supported.', 'warning')
+        return redirect(request.url)
+    return render_template('update.html', job_id=request.args.get('job'))
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found.'}), 404
+    return jsonify(job)
+
+@app.route('/metrics')
+def metrics():
+    """Metrics proses ini dalam format teks Prometheus."""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 # --- FUNGSI ADD SUPPLIER ---
 @app.route('/supplier/add', methods=['POST'])
@@ -186,50 +2240,51 @@ def add_supplier():
         target_year = month_input.year
         file_path = get_data_file_path(target_year)
         
-        df = load_data(file_path)
-        if 'row_id' in df.columns: df = df.drop(columns=['row_id'])
-
         supplier_name = form['supplier_name'].strip() # Trim whitespace
         if not supplier_name:
              flash('Supplier name cannot be empty.', 'warning')
              return redirect(url_for('index'))
 
-        # Cek duplikat (case-insensitive)
-        if not df.empty and supplier_name.lower() in df['SUPPLIER NAME'].str.lower().unique():
-            flash(f'Supplier "{supplier_name}" already exists for year {target_year}.', 'warning')
-            return redirect(url_for('index'))
+        # Dikunci selama cek duplikat + penulisan (juga terhadap proses lain)
+        with _year_lock(file_path):
+            # Cek duplikat (case-insensitive) lewat indeks supplier
+            if find_supplier(supplier_name, year=target_year) is not None:
+                flash(f'Supplier "{supplier_name}" already exists for year {target_year}.', 'warning')
+                return redirect(url_for('index'))
+
+            # Hanya nama kolom dan baris pertama yang dibutuhkan
+            columns, first_row = year_template(file_path)
             
-        total_delivery_val = int(float(form['total_delivery']))
-        on_time_val = int(float(form['on_time']))
-        achievement_val = (on_time_val / total_delivery_val) if total_delivery_val > 0 else (1.0 if on_time_val == 0 else 0.0)
-
-        new_row_data = {
-            'CLOSING MONTH': month_input, 
-            'SUPPLIER NAME': supplier_name,
-            'TOTAL DELIVERY ITEM': total_delivery_val, 
-            'ON TIME': on_time_val,
-            'MINUS': int(float(form['minus'])),
-            # --- PERUBAHAN DI SINI ---
-            'TARGET DELIVERY': 0.9, # Nilai tetap 90%
-            'ACHIEVEMENT': achievement_val,
-            'Purchase Amount': float(form['purchase_amount']),
-            # Handle potential missing 'ITEM DELAY' if your Excel doesn't always have it
-            'ITEM DELAY': df['ITEM DELAY'].iloc[0] if 'ITEM DELAY' in df.columns and not df.empty else 0 
-        }
-        # Tambah kolom lain jika ada, dengan nilai default atau NaN
-        # Pastikan kolom baru konsisten dengan file Excel yang ada
-        expected_cols = df.columns.tolist() if not df.empty else list(new_row_data.keys())
-        for col in expected_cols:
-             if col not in new_row_data:
-                  new_row_data[col] = pd.NA # Atau 0 atau '' sesuai tipe data kolom
-
-        # Buat DataFrame baru dengan urutan kolom yang benar
-        df_new_row = pd.DataFrame([new_row_data], columns=expected_cols)
-        
-        df_final = pd.concat([df, df_new_row], ignore_index=True)
-        
-        if save_data(df_final, file_path): 
-            flash(f'New supplier "{supplier_name}" added successfully for {target_year}!', 'success')
+            total_delivery_val = int(float(form['total_delivery']))
+            on_time_val = int(float(form['on_time']))
+            achievement_val = (on_time_val / total_delivery_val) if total_delivery_val > 0 else (1.0 if on_time_val == 0 else 0.0)
+
+            new_row_data = {
+                'CLOSING MONTH': month_input, 
+                'SUPPLIER NAME': supplier_name,
+                'TOTAL DELIVERY ITEM': total_delivery_val, 
+                'ON TIME': on_time_val,
+                'MINUS': int(float(form['minus'])),
+                # --- PERUBAHAN DI SINI ---
+                'TARGET DELIVERY': 0.9, # Nilai tetap 90%
+                'ACHIEVEMENT': achievement_val,
+                'Purchase Amount': float(form['purchase_amount']),
+                # Handle potential missing 'ITEM DELAY' if your Excel doesn't always have it
+                'ITEM DELAY': first_row['ITEM DELAY'] if first_row is not None and 'ITEM DELAY' in first_row else 0
+            }
+            # Tambah kolom lain jika ada, dengan nilai default atau NaN
+            # Pastikan kolom baru konsisten dengan file Excel yang ada
+            expected_cols = columns if first_row is not None else list(new_row_data.keys())
+            for col in expected_cols:
+                 if col not in new_row_data:
+                      new_row_data[col] = pd.NA # Atau 0 atau '' sesuai tipe data kolom
+
+            # Susun baris baru dengan urutan kolom yang benar, lalu tambahkan lewat journal
+            new_row = {col: new_row_data[col] for col in expected_cols}
+
+            if append_row(file_path, new_row): 
+                supplier_index_record_write(file_path, supplier_name, +1, month=month_input)
+                flash(f'New supplier "{supplier_name}" added successfully for {target_year}!', 'success')
         return redirect(url_for('index'))
 
     except ValueError:
@@ -244,25 +2299,20 @@ def add_supplier():
 @app.route('/data/add/<supplier_name>', methods=['POST'])
 def add_monthly_entry(supplier_name):
     form = request.form
+    year_lock = None # Dikunci selama cek duplikat + penulisan
     try:
         form_month = datetime.strptime(form['month'], '%Y-%m')
         target_year = form_month.year
         file_path = get_data_file_path(target_year)
-        df = load_data(file_path)
-        
-        data_exists = False
-        if not df.empty:
-            df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
-            mask = (df['SUPPLIER NAME'].str.lower() == supplier_name.lower()) & \
-                   (df['CLOSING MONTH'].dt.year == form_month.year) & \
-                   (df['CLOSING MONTH'].dt.month == form_month.month)
-            if df[mask].any().any(): # Check if any row matches
-                data_exists = True
-
-        if data_exists:
+        year_lock = _year_lock(file_path)
+        year_lock.acquire()
+
+        # Cek duplikat (supplier + bulan, case-insensitive) lewat indeks supplier
+        if supplier_has_month(supplier_name, form_month):
             flash(f'Data for {form_month.strftime("%B %Y")} already exists in data_{target_year}.xlsx. Use "Edit".', 'warning')
         else:
-            if 'row_id' in df.columns: df = df.drop(columns=['row_id'])
+            # Hanya nama kolom dan baris pertama yang dibutuhkan
+            columns, first_row = year_template(file_path)
             
             total_delivery_val = int(float(form['total_delivery']))
             on_time_val = int(float(form['on_time']))
@@ -279,24 +2329,27 @@ def add_monthly_entry(supplier_name):
                 'ACHIEVEMENT': achievement_val,
                 'Purchase Amount': float(form['purchase_amount']),
                 # Handle potential missing 'ITEM DELAY' 
-                'ITEM DELAY': df['ITEM DELAY'].iloc[0] if 'ITEM DELAY' in df.columns and not df.empty else 0
+                'ITEM DELAY': first_row['ITEM DELAY'] if first_row is not None and 'ITEM DELAY' in first_row else 0
             }
             # Tambah kolom lain jika ada
-            expected_cols = df.columns.tolist() if not df.empty else list(new_row_data.keys())
+            expected_cols = columns if first_row is not None else list(new_row_data.keys())
             for col in expected_cols:
                  if col not in new_row_data:
                       new_row_data[col] = pd.NA 
 
-            df_new_row = pd.DataFrame([new_row_data], columns=expected_cols)
-            df_final = pd.concat([df, df_new_row], ignore_index=True)
+            new_row = {col: new_row_data[col] for col in expected_cols}
 
-            if save_data(df_final, file_path): 
+            if append_row(file_path, new_row): 
+                supplier_index_record_write(file_path, supplier_name, +1, month=form_month)
                 flash(f'Data for {form_month.strftime("%B %Y")} added successfully to data_{target_year}.xlsx!', 'success')
                 
     except ValueError:
         flash('Invalid number format entered.', 'danger')
     except Exception as e:
         flash(f'An error occurred: {e}', 'danger')
+    finally:
+        if year_lock is not None:
+            year_lock.release()
 
     return redirect(url_for('dashboard', supplier_name=supplier_name))
 
@@ -309,34 +2362,57 @@ def edit_entry(row_id):
     try:
         form_month = datetime.strptime(form['month'], '%Y-%m')
         target_year = form_month.year
-        file_path = get_data_file_path(target_year)
-        df = load_data(file_path)
-        
-        if not df.empty and row_id in df['row_id'].values:
-            # Dapatkan nama supplier SEBELUM update, untuk redirect
-            supplier_name_redirect = df.loc[df['row_id'] == row_id, 'SUPPLIER NAME'].iloc[0]
+        # Tahun file sumber dibaca langsung dari row_id, tidak perlu memindai semua file
+        source_year = year_from_row_id(row_id)
+        source_path = get_data_file_path(source_year)
+        target_path = get_data_file_path(target_year)
+        with contextlib.ExitStack() as stack:
+            # Kunci diambil berurutan agar tidak deadlock saat memindahkan baris antar tahun
+            for path in sorted({source_path, target_path}):
+                stack.enter_context(_year_lock(path))
+            row = find_row(source_path, row_id)
+            if row is not None:
+                # Dapatkan nama supplier SEBELUM update, untuk redirect
+                supplier_name_redirect = row['SUPPLIER NAME']
 
-            total_delivery_val = int(float(form['total_delivery']))
-            on_time_val = int(float(form['on_time']))
-            achievement_val = (on_time_val / total_delivery_val) if total_delivery_val > 0 else (1.0 if on_time_val == 0 else 0.0)
+                total_delivery_val = int(float(form['total_delivery']))
+                on_time_val = int(float(form['on_time']))
+                achievement_val = (on_time_val / total_delivery_val) if total_delivery_val > 0 else (1.0 if on_time_val == 0 else 0.0)
 
-            # Update data di DataFrame
-            df.loc[df['row_id'] == row_id, 'CLOSING MONTH'] = form_month
-            df.loc[df['row_id'] == row_id, 'TOTAL DELIVERY ITEM'] = total_delivery_val
-            df.loc[df['row_id'] == row_id, 'ON TIME'] = on_time_val
-            df.loc[df['row_id'] == row_id, 'MINUS'] = int(float(form['minus']))
-            # --- PERUBAHAN DI SINI ---
-            df.loc[df['row_id'] == row_id, 'TARGET DELIVERY'] = 0.9 # Nilai tetap 90%
-            df.loc[df['row_id'] == row_id, 'ACHIEVEMENT'] = achievement_val
-            df.loc[df['row_id'] == row_id, 'Purchase Amount'] = float(form['purchase_amount'])
-            # Update kolom lain jika perlu (misal: 'ITEM DELAY')
-            
-            if save_data(df, file_path): 
+                values = {
+                    'CLOSING MONTH': form_month,
+                    'TOTAL DELIVERY ITEM': total_delivery_val,
+                    'ON TIME': on_time_val,
+                    'MINUS': int(float(form['minus'])),
+                    'TARGET DELIVERY': 0.9, # Nilai tetap 90%
+                    'ACHIEVEMENT': achievement_val,
+                    'Purchase Amount': float(form['purchase_amount']),
+                }
+                if target_year == source_year:
+                    # Update satu baris lewat journal (tanpa menulis ulang workbook)
+                    updated = update_row(source_path, row_id, values)
+                    if updated:
+                        supplier_index_record_write(source_path, supplier_name_redirect, -1, month=row['CLOSING MONTH'])
+                        supplier_index_record_write(source_path, supplier_name_redirect, +1, month=form_month)
+                else:
+                    # Bulan dipindah ke tahun lain: pindahkan baris ke file tahun tujuan.
+                    # Tahun sumber dicek dulu agar baris tidak tersalin tanpa bisa dihapus
+                    if not _use_sqlite():
+                        _check_journal_conflict(source_path)
+                    new_row = row.drop(labels=['row_id']).to_dict()
+                    new_row.update(values)
+                    updated = append_row(target_path, new_row) and delete_row(source_path, row_id)
+                    if updated:
+                        supplier_index_record_write(target_path, supplier_name_redirect, +1, month=form_month)
+                        supplier_index_record_write(source_path, supplier_name_redirect, -1, month=row['CLOSING MONTH'])
+        
+        if supplier_name_redirect:
+            if updated: 
                 flash('Data updated successfully!', 'success')
             # Redirect ke dashboard supplier yang diedit
             return redirect(url_for('dashboard', supplier_name=supplier_name_redirect))
         else: 
-            flash(f'Data with ID {row_id} not found for year {target_year}.', 'danger')
+            flash(f'Data with ID {row_id} not found in data_{source_year}.xlsx.', 'danger')
             # Coba redirect ke index jika nama supplier tidak ditemukan
             return redirect(url_for('index'))
             
@@ -358,63 +2434,170 @@ def edit_entry(row_id):
 # --- FUNGSI DELETE ENTRY ---
 @app.route('/data/delete/<int:row_id>', methods=['POST'])
 def delete_entry(row_id):
-    df_all = load_all_data()
     supplier_name_redirect = "" # Untuk redirect
-    if df_all.empty:
-        flash('No data found to delete from.', 'danger')
-        return redirect(url_for('index'))
+    # File pemilik baris diketahui dari row_id, jadi hanya satu file yang dibuka
+    target_year = year_from_row_id(row_id)
+    file_path = get_data_file_path(target_year)
 
-    target_row = df_all[df_all['row_id'] == row_id]
-    
-    if not target_row.empty:
-        supplier_name_redirect = target_row.iloc[0]['SUPPLIER NAME']
-        closing_month = pd.to_datetime(target_row.iloc[0]['CLOSING MONTH'])
-        target_year = closing_month.year
-        file_path = get_data_file_path(target_year)
-        
-        try:
-            df_single_file = load_data(file_path)
-            # Pastikan row_id ada sebelum mencoba menghapus
-            if not df_single_file.empty and row_id in df_single_file['row_id'].values:
-                df_single_file = df_single_file[df_single_file['row_id'] != row_id]
-                if save_data(df_single_file, file_path): 
-                    flash(f'Data for {closing_month.strftime("%B %Y")} deleted successfully from data_{target_year}.xlsx!', 'success')
-                else:
-                    flash('Failed to save after deleting data.', 'danger') # Pesan error lebih spesifik
-            else:
-                 flash(f'Data with ID {row_id} not found in specific file data_{target_year}.xlsx.', 'warning')
+    try:
+        with _year_lock(file_path):
+            target_row = find_row(file_path, row_id)
+            if target_row is not None:
+                supplier_name_redirect = target_row['SUPPLIER NAME']
+                closing_month = pd.to_datetime(target_row['CLOSING MONTH'])
+                deleted = delete_row(file_path, row_id)
+    except Exception as e:
+        flash(f'An error occurred during deletion: {e}', 'danger')
+        if supplier_name_redirect:
+            return redirect(url_for('dashboard', supplier_name=supplier_name_redirect))
+        return redirect(url_for('index'))
 
-        except Exception as e:
-             flash(f'An error occurred during deletion: {e}', 'danger')
-    else: 
-        flash(f'Data with ID {row_id} not found in any file.', 'danger')
+    if target_row is None:
+        flash(f'Data with ID {row_id} not found in data_{target_year}.xlsx.', 'danger')
         return redirect(url_for('index')) # Redirect ke index jika data tidak ditemukan sama sekali
 
-    # Redirect ke dashboard supplier yang datanya dihapus, jika nama supplier ada
-    if supplier_name_redirect:
-         return redirect(url_for('dashboard', supplier_name=supplier_name_redirect))
-    else:
-         return redirect(url_for('index')) # Fallback ke index jika nama supplier tidak ada
+    if deleted:
+        supplier_index_record_write(file_path, supplier_name_redirect, -1, month=closing_month)
+        flash(f'Data for {closing_month.strftime("%B %Y")} deleted successfully from data_{target_year}.xlsx!', 'success')
+
+    # Redirect ke dashboard supplier yang datanya dihapus
+    return redirect(url_for('dashboard', supplier_name=supplier_name_redirect))
 
 
 # --- Rute Lainnya ---
 @app.route('/check_supplier', methods=['POST'])
 def check_supplier():
-    df = load_all_data()
-    name_to_check = request.form.get('supplier_name', '').strip().lower()
-    if df.empty or 'SUPPLIER NAME' not in df.columns:
+    stats = get_supplier_stats(request.form.get('supplier_name', ''))
+    if stats is None:
         return jsonify({'exists': False})
-    # Gunakan .any() untuk cek keberadaan
-    is_present = df['SUPPLIER NAME'].str.strip().str.lower().eq(name_to_check).any()
-    return jsonify({'exists': bool(is_present)})
+    return jsonify({'exists': True, **stats})
 
 @app.context_processor
 def inject_suppliers():
-    df = load_all_data()
-    supplier_list = []
-    if not df.empty and 'SUPPLIER NAME' in df.columns:
-        supplier_list = sorted(df['SUPPLIER NAME'].dropna().unique().tolist()) # Tambah dropna()
-    return dict(all_suppliers=supplier_list)
+    return dict(all_suppliers=get_supplier_names())
+
+# --- Perintah CLI ---
+@app.cli.command('rebuild-sidecars')
+def rebuild_sidecars_command():
+    """Membuat ulang semua sidecar .feather dari file data_*.xlsx."""
+    if feather is None:
+        raise click.ClickException("pyarrow is not installed; sidecars are disabled.")
+    all_files = sorted(glob.glob(os.path.join(DATA_FOLDER_PATH, "data_*.xlsx")))
+    for file_path in all_files:
+        start = time.perf_counter()
+        signature = _file_signature(file_path)
+        ok = write_sidecar(pd.read_excel(file_path), file_path, signature)
+        status = "ok" if ok else "FAILED"
+        click.echo(f"{os.path.basename(file_path)}: {status} ({time.perf_counter() - start:.3f}s)")
+    click.echo(f"{len(all_files)} file(s) processed.")
+
+@app.cli.command('bench-load')
+@click.option('--repeat', default=3, show_default=True, help='Number of runs per measurement.')
+def bench_load_command(repeat):
+    """Membandingkan waktu load: Excel (jalur lama), sidecar (cold) dan cache (warm)."""
+    all_files = sorted(glob.glob(os.path.join(DATA_FOLDER_PATH, "data_*.xlsx")))
+    if not all_files:
+        raise click.ClickException(f"No data_*.xlsx files found in {DATA_FOLDER_PATH}.")
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def load_excel_only():
+        for fp in all_files:
+            pd.read_excel(fp)
+
+    def load_cold():
+        invalidate_data_cache()
+        load_all_data()
+
+    if feather is not None:
+        for fp in all_files:
+            signature = _file_signature(fp)
+            if _read_sidecar(fp, signature) is None:
+                write_sidecar(pd.read_excel(fp), fp, signature)
+
+    results = [("Excel parse (old path)", best_of(load_excel_only))]
+    if feather is not None:
+        results.append(("Sidecar, cold cache", best_of(load_cold)))
+    else:
+        click.echo("pyarrow is not installed; skipping sidecar measurement.")
+    load_all_data()
+    results.append(("In-process cache, warm", best_of(load_all_data)))
+
+    click.echo(f"{len(all_files)} file(s), best of {repeat} run(s):")
+    for label, seconds in results:
+        click.echo(f"  {label:<26} {seconds * 1000:10.2f} ms")
+
+@app.cli.command('compact-journals')
+def compact_journals_command():
+    """Menerapkan semua journal perubahan ke file Excel tahunan."""
+    failed = []
+    for file_path in sorted(glob.glob(os.path.join(DATA_FOLDER_PATH, "data_*.xlsx"))):
+        try:
+            if compact_journal(file_path):
+                click.echo(f"{os.path.basename(file_path)}: compacted")
+        except Exception as e:
+            failed.append(os.path.basename(file_path))
+            click.echo(f"{os.path.basename(file_path)}: FAILED, file left unchanged ({e})")
+    if failed:
+        raise click.ClickException(f"Compaction failed for: {', '.join(failed)}")
+
+@app.cli.command('resolve-journal')
+@click.argument('file_name')
+@click.option('--apply', 'action', flag_value='apply', help='Terapkan ulang entri journal di atas workbook saat ini lalu simpan.')
+@click.option('--discard', 'action', flag_value='discard', help='Pindahkan journal ke file .discarded-* (workbook dipakai apa adanya).')
+def resolve_journal_command(file_name, action):
+    """Menyelesaikan journal yang entrinya ditulis sebelum workbook diubah di luar aplikasi."""
+    file_path = os.path.join(DATA_FOLDER_PATH, os.path.basename(file_name))
+    if not os.path.exists(file_path):
+        raise click.ClickException(f"No data file found at {file_path}.")
+    with _year_lock(file_path):
+        orphans = _journal_orphans(file_path, _file_signature(file_path))
+        if not orphans:
+            click.echo(f"{os.path.basename(file_path)}: no unresolved journal entries")
+            return
+        for op in orphans:
+            click.echo(f"  {op.get('op')} {op.get('row_id', '')} {json.dumps(op.get('row', op.get('values', {})))}")
+        if action is None:
+            raise click.ClickException(f"{len(orphans)} unresolved journal entries; rerun with --apply or --discard.")
+        if action == 'apply':
+            # Strict: jika ada entri yang tidak bisa diterapkan, workbook tidak disentuh
+            _write_excel_data_file(_read_excel_data_file(file_path), file_path, resolve=True)
+            click.echo(f"{os.path.basename(file_path)}: {len(orphans)} entries applied and saved")
+        else:
+            discarded = f"{get_journal_path(file_path)}.discarded-{datetime.now():%Y%m%d%H%M%S}"
+            os.replace(get_journal_path(file_path), discarded)
+            invalidate_data_cache(file_path)
+            click.echo(f"{os.path.basename(file_path)}: journal moved to {os.path.basename(discarded)}")
+
+@app.cli.command('storage-import')
+def storage_import_command():
+    """Mengimpor semua file data_YYYY.xlsx (+ journal) ke database SQLite."""
+    all_files = sorted(glob.glob(os.path.join(DATA_FOLDER_PATH, "data_*.xlsx")))
+    if not all_files:
+        raise click.ClickException(f"No data_*.xlsx files found in {DATA_FOLDER_PATH}.")
+    for file_path in all_files:
+        df = _read_excel_data_file(file_path)
+        _sqlite_write_year(df, file_path)
+        click.echo(f"{os.path.basename(file_path)}: {len(df)} row(s) imported")
+    click.echo(f"Database: {get_sqlite_path()}. Set STORAGE_ENGINE=sqlite to use it.")
+
+@app.cli.command('storage-export')
+def storage_export_command():
+    """Mengekspor database SQLite ke file data_YYYY.xlsx (menimpa file yang ada)."""
+    if not os.path.exists(get_sqlite_path()):
+        raise click.ClickException(f"No database found at {get_sqlite_path()}.")
+    years = _sqlite_connect().execute("SELECT year FROM years ORDER BY year").fetchall()
+    for (year,) in years:
+        file_path = get_data_file_path(year)
+        df = _sqlite_read_year(file_path)
+        _write_excel_data_file(df, file_path)
+        click.echo(f"{os.path.basename(file_path)}: {len(df)} row(s) exported")
 
 # --- Run App ---
 if __name__ == '__main__':
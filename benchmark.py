@@ -0,0 +1,282 @@
+"""Benchmark aplikasi dashboard dengan dataset sintetis multi-tahun.
+
+Membuat file data_YYYY.xlsx sintetis (ukuran bisa diatur), lalu menjalankan
+route utama lewat Flask test client: index, dashboard, check_supplier,
+/update (job upload), edit, dan delete. Hasilnya berupa persentil latensi,
+throughput, dan puncak memori, ditulis ke JSON agar bisa dibandingkan antar
+perubahan.
+
+Contoh:
+    python benchmark.py --years 10 --suppliers 5000 --output bench.json
+    python benchmark.py --engine sqlite --memory
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import openpyxl
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+COLUMNS = ['NO', 'CLOSING MONTH', 'SUPPLIER CODE', 'SUPPLIER NAME', 'TOTAL DELIVERY ITEM', 'ON TIME',
+           'DELAY *', 'DELAY **', 'DELAY ***', 'DELAY ****', 'ITEM DELAY', 'MINUS WEIGHT', 'MINUS',
+           'TARGET DELIVERY', 'ACHIEVEMENT', 'JUDGE', 'Purchase Amount']
+
+
+# --- Dataset Sintetis ---
+def supplier_names(count):
+    return [f"supplier {i:05d}" for i in range(count)]
+
+def synthetic_row(rng, no, month, code, name):
+    """Satu baris dengan kolom dan tipe yang sama seperti file data asli."""
+    total = rng.randint(1, 120)
+    delays = [rng.randint(0, max(0, total // 8)) for _ in range(4)]
+    item_delay = min(total, sum(delays))
+    on_time = total - item_delay
+    achievement = on_time / total
+    minus = -sum(weight * count for weight, count in zip((0.25, 0.5, 0.75, 1.0), delays))
+    return [no, month, code, name, total, on_time, *delays, item_delay, round(-minus / total, 3), minus,
+            0.9, achievement, 'O' if achievement >= 0.9 else 'X', rng.randint(1, 500) * 100000]
+
+def write_year_file(path, year, names, months, rng):
+    """Menulis satu file data_YYYY.xlsx (openpyxl write-only, memori tetap kecil)."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(COLUMNS)
+    rows = 0
+    for month in range(1, months + 1):
+        closing_month = datetime(year, month, 1)
+        for code, name in enumerate(names, start=1):
+            rows += 1
+            ws.append(synthetic_row(rng, rows, closing_month, code, name))
+    wb.save(path)
+    return rows
+
+def generate_dataset(folder, years, suppliers, months, seed, first_year):
+    """Membuat satu file per tahun. Mengembalikan ringkasan dataset."""
+    rng = random.Random(seed)
+    names = supplier_names(suppliers)
+    start = time.perf_counter()
+    rows = 0
+    for year in range(first_year, first_year + years):
+        rows += write_year_file(os.path.join(folder, f"data_{year}.xlsx"), year, names, months, rng)
+    size = sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder) if f.endswith('.xlsx'))
+    return {'years': years, 'suppliers': suppliers, 'months_per_year': months, 'rows': rows,
+            'bytes': size, 'seed': seed, 'generate_seconds': round(time.perf_counter() - start, 3)}
+
+def generate_upload(path, years, names, rng):
+    """File upload: satu bulan baru per tahun untuk sebagian supplier."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(COLUMNS)
+    no = 0
+    for year in years:
+        for code, name in enumerate(names, start=1):
+            no += 1
+            ws.append(synthetic_row(rng, no, datetime(year, 12, 28), code, name))
+    wb.save(path)
+
+
+# --- Pengukuran ---
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(latencies, wall_seconds, peak_bytes=None):
+    """Statistik latensi (ms), throughput, dan puncak memori satu skenario."""
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    result = {
+        'count': len(ordered),
+        'cold_ms': ms(latencies[0]) if latencies else None,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p90_ms': ms(percentile(ordered, 90)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+        'throughput_rps': round(len(ordered) / wall_seconds, 2) if wall_seconds > 0 else None,
+    }
+    if peak_bytes is not None:
+        result['peak_memory_bytes'] = peak_bytes
+    return result
+
+def run_scenario(name, iterations, call, trace_memory):
+    """Menjalankan call(i) sebanyak iterations kali; call mengembalikan response Flask."""
+    if trace_memory:
+        tracemalloc.reset_peak()
+    latencies = []
+    errors = 0
+    wall_start = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        response = call(i)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+    wall = time.perf_counter() - wall_start
+    peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    result = summarize(latencies, wall, peak)
+    result['errors'] = errors
+    print(f"  {name:<16} n={result['count']:<5} p50={result['p50_ms']:>9} ms  p95={result['p95_ms']:>9} ms  "
+          f"{result['throughput_rps']} req/s")
+    return result
+
+def wait_for_job(client, status_url, timeout=600):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(f"Upload job did not finish within {timeout}s")
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=3, help='Number of yearly data files (default: 3).')
+    parser.add_argument('--suppliers', type=int, default=200, help='Suppliers per year (default: 200).')
+    parser.add_argument('--months', type=int, default=12, help='Months per supplier per year (default: 12).')
+    parser.add_argument('--first-year', type=int, default=2016, help='First data year (default: 2016).')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for data and request order (default: 42).')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per read scenario (default: 50).')
+    parser.add_argument('--writes', type=int, default=20, help='Requests per edit/delete scenario (default: 20).')
+    parser.add_argument('--uploads', type=int, default=2, help='Upload jobs to run (default: 2).')
+    parser.add_argument('--engine', choices=['excel', 'sqlite'], default='excel', help='Storage engine (default: excel).')
+    parser.add_argument('--data-dir', help='Folder for the generated data (default: a temporary folder).')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated data folder.')
+    parser.add_argument('--memory', action='store_true',
+                        help='Track Python allocations with tracemalloc (slower; reports peak memory per scenario).')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON result file (default: benchmark_results.json).')
+    args = parser.parse_args(argv)
+
+    # Engine dibaca app.py saat import (juga oleh worker upload), jadi diatur lewat environment
+    os.environ['STORAGE_ENGINE'] = args.engine
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as dashboard
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='dashboard-bench-')
+    os.makedirs(data_dir, exist_ok=True)
+    rng = random.Random(args.seed)
+    try:
+        print(f"Generating {args.years} year(s) x {args.suppliers} supplier(s) x {args.months} month(s) in {data_dir} ...")
+        dataset = generate_dataset(data_dir, args.years, args.suppliers, args.months, args.seed, args.first_year)
+        print(f"  {dataset['rows']} rows, {dataset['bytes'] / 1e6:.1f} MB in {dataset['generate_seconds']}s")
+
+        dashboard.DATA_FOLDER_PATH = data_dir
+        client = dashboard.app.test_client()
+        if args.engine == 'sqlite':
+            result = dashboard.app.test_cli_runner().invoke(args=['storage-import'])
+            if result.exit_code != 0:
+                raise SystemExit(result.output)
+
+        names = supplier_names(args.suppliers)
+        years = list(range(args.first_year, args.first_year + args.years))
+        upload_path = os.path.join(data_dir, 'upload.xlsx')  # tidak cocok dengan pola data_*.xlsx
+        generate_upload(upload_path, years, names[:max(1, args.suppliers // 10)], rng)
+
+        if args.memory:
+            tracemalloc.start()
+        rusage_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+        total_start = time.perf_counter()
+        scenarios = {}
+        print("Running scenarios:")
+
+        scenarios['index'] = run_scenario('index', args.requests, lambda i: client.get('/'), args.memory)
+
+        picks = [rng.choice(names) for _ in range(args.requests)]
+        scenarios['dashboard'] = run_scenario(
+            'dashboard', args.requests, lambda i: client.get(f'/dashboard/{picks[i]}'), args.memory)
+        scenarios['supplier_rows_api'] = run_scenario(
+            'supplier_rows', args.requests, lambda i: client.get(f'/api/suppliers/{picks[i]}/rows'), args.memory)
+        scenarios['check_supplier'] = run_scenario(
+            'check_supplier', args.requests,
+            lambda i: client.post('/check_supplier', data={'supplier_name': picks[i].upper()}), args.memory)
+
+        def upload(i):
+            with open(upload_path, 'rb') as f:
+                response = client.post('/update', data={'file': (f, 'upload.xlsx')},
+                                       content_type='multipart/form-data', headers={'Accept': 'application/json'})
+            job = wait_for_job(client, response.get_json()['status_url'])
+            if job['status'] != 'done':
+                print(f"  upload job failed: {job.get('message')}")
+                response.status_code = 500
+            return response
+        scenarios['update_upload'] = run_scenario('update (job)', args.uploads, upload, args.memory)
+
+        # Baris target diambil di luar pengukuran; setiap delete memakai baris berbeda
+        all_rows = dashboard.load_all_data()
+        sample = all_rows.sample(n=min(len(all_rows), args.writes * 2), random_state=args.seed)
+        edit_rows = sample.iloc[:args.writes]
+        delete_ids = sample['row_id'].iloc[args.writes:].tolist()
+
+        def edit(i):
+            row = edit_rows.iloc[i % len(edit_rows)]
+            form = {'month': row['CLOSING MONTH'].strftime('%Y-%m'), 'total_delivery': '100',
+                    'on_time': str(rng.randint(50, 100)), 'minus': '0', 'purchase_amount': '1000000'}
+            # row_id tetap sama karena supplier dan bulan tidak berubah
+            return client.post(f"/data/edit/{int(row['row_id'])}", data=form)
+        scenarios['edit'] = run_scenario('edit', min(args.writes, len(edit_rows)), edit, args.memory)
+        scenarios['delete'] = run_scenario(
+            'delete', len(delete_ids), lambda i: client.post(f"/data/delete/{int(delete_ids[i])}"), args.memory)
+        # Dashboard setelah penulisan: cache dibangun ulang
+        scenarios['dashboard_after_writes'] = run_scenario(
+            'dashboard (dirty)', min(args.requests, 10), lambda i: client.get(f'/dashboard/{picks[i]}'), args.memory)
+
+        total_seconds = time.perf_counter() - total_start
+        memory = {}
+        if args.memory:
+            memory['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if resource:
+            # ru_maxrss: KB di Linux, byte di macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            memory['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+            memory['max_rss_before_bytes'] = rusage_start * scale
+
+        results = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'engine': args.engine,
+                'args': vars(args),
+            },
+            'dataset': dataset,
+            'scenarios': scenarios,
+            'memory': memory,
+            'total_seconds': round(total_seconds, 3),
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"Done in {total_seconds:.1f}s. Results written to {args.output}")
+        return results
+    finally:
+        if not args.keep and not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app as dashboard
+import benchmark
+
+YEARS = [2020, 2021]
+SUPPLIERS = 6
+
+
+def _reset_state():
+    dashboard.invalidate_data_cache()
+    with dashboard._SUPPLIER_INDEX_LOCK:
+        dashboard._SUPPLIER_INDEX.update(built=False, signatures={}, by_year={}, months={},
+                                         normalized={}, sorted=None)
+
+
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    """Folder data sintetis (2 tahun x 6 supplier x 12 bulan) dengan engine Excel."""
+    benchmark.generate_dataset(str(tmp_path), years=len(YEARS), suppliers=SUPPLIERS, months=12,
+                               seed=7, first_year=YEARS[0])
+    monkeypatch.setattr(dashboard, 'DATA_FOLDER_PATH', str(tmp_path))
+    monkeypatch.setitem(dashboard.app.config, 'STORAGE_ENGINE', 'excel')
+    _reset_state()
+    yield str(tmp_path)
+    _reset_state()
+
+
+@pytest.fixture(autouse=True)
+def _no_background_compaction(monkeypatch):
+    """Compaction dan merge upload dijalankan eksplisit/sinkron agar test deterministik."""
+    monkeypatch.setitem(dashboard.app.config, 'JOURNAL_COMPACT_THRESHOLD', 10**6)
+    monkeypatch.setitem(dashboard.app.config, 'JOURNAL_COMPACT_IDLE_SECONDS', None)
+    monkeypatch.setitem(dashboard.app.config, 'UPLOAD_MERGE_WORKERS', 1)
+
+
+@pytest.fixture
+def client(data_folder):
+    dashboard.app.config['TESTING'] = True
+    with dashboard.app.test_client() as client:
+        yield client
+
+
+FORM = {'total_delivery': '10', 'on_time': '9', 'minus': '0', 'purchase_amount': '1234.5'}
+
+
+def frame(df):
+    """Frame yang bisa dibandingkan antar sumber: urut row_id, nilai kosong -> None."""
+    df = df.sort_values('row_id', kind='stable').reset_index(drop=True)
+    df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
+    df = df[sorted(df.columns)].astype(object)
+    return df.where(df.notna(), None)
+
+
+def assert_same(left, right):
+    pd.testing.assert_frame_equal(frame(left), frame(right), check_dtype=False)
+
+
+def rehashed(df, year):
+    """row_id yang dihitung ulang dari nol untuk seluruh df (acuan)."""
+    return dashboard._assign_row_ids(df.drop(columns=['row_id']).copy(), year)['row_id'].tolist()
+
+
+def find(df, supplier_name, month):
+    match = df[(df['SUPPLIER NAME'] == supplier_name) & (pd.to_datetime(df['CLOSING MONTH']) == pd.Timestamp(month))]
+    assert len(match) == 1, (supplier_name, month, len(match))
+    return match.iloc[0]
+
+
+def cold_load(file_path):
+    dashboard.invalidate_data_cache()
+    return dashboard.load_data(file_path)
@@ -0,0 +1,50 @@
+"""Keyset pagination API supplier, termasuk baris tanpa CLOSING MONTH."""
+import pytest
+
+import benchmark
+from conftest import SUPPLIERS, dashboard
+
+
+def _pages(client, url, limit):
+    """Semua halaman sebuah endpoint, mengikuti next_cursor sampai habis."""
+    pages, cursor = [], None
+    while True:
+        body = client.get(url, query_string={'limit': limit, **({'cursor': cursor} if cursor else {})}).get_json()
+        pages.append(body)
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def undated_supplier(data_folder):
+    """Supplier dengan dua baris tanpa CLOSING MONTH."""
+    name = benchmark.supplier_names(SUPPLIERS)[0]
+    file_path = dashboard.get_data_file_path(2021)
+    row = dashboard.load_data(file_path).drop(columns=['row_id']).iloc[0].to_dict()
+    for on_time in (1, 2):
+        dashboard.append_row(file_path, dict(row, **{'SUPPLIER NAME': name, 'CLOSING MONTH': None, 'ON TIME': on_time}))
+    return name
+
+
+def test_rows_pages_cover_undated_rows(client, undated_supplier):
+    full = client.get(f'/api/suppliers/{undated_supplier}/rows', query_string={'limit': 500}).get_json()
+    assert len(full['rows']) == 26 and full['next_cursor'] is None
+    assert [row['CLOSING MONTH'] for row in full['rows'][-2:]] == [None, None]
+
+    pages = _pages(client, f'/api/suppliers/{undated_supplier}/rows', limit=5)
+    assert [row for page in pages for row in page['rows']] == full['rows']
+    assert all(page['rows'] for page in pages)
+
+
+def test_series_is_paginated_oldest_first(client, undated_supplier):
+    url = f'/api/suppliers/{undated_supplier}/series'
+    full = client.get(url).get_json()
+    assert full['points'] == 26 and full['next_cursor'] is None
+    months = full['series']['CLOSING MONTH']
+    assert months[:24] == sorted(months[:24]) and months[24:] == [None, None]
+
+    pages = _pages(client, url, limit=7)
+    assert [len(page['series']['ON TIME']) for page in pages] == [7, 7, 7, 5]
+    assert [value for page in pages for value in page['series']['ON TIME']] == full['series']['ON TIME']
+    assert client.get(url, query_string={'cursor': 'x'}).status_code == 400
@@ -0,0 +1,85 @@
+"""Grafik ringan (dict spesifikasi) harus setara dengan versi go.Figure setelah di-parse."""
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+import pytest
+
+from conftest import dashboard
+
+
+def create_performance_figure(df):
+    """Versi go.Figure dari create_performance_chart (acuan)."""
+    if df.empty or 'CLOSING MONTH' not in df.columns: return json.dumps({})
+    df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
+    df = df.sort_values('CLOSING MONTH')
+    month_labels = df['CLOSING MONTH'].dt.strftime('%B %Y')
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=month_labels, y=df['TOTAL DELIVERY ITEM'], name='Total Delivery (Bar)', marker_color='#C50000'))
+    fig.add_trace(go.Bar(x=month_labels, y=df['ON TIME'], name='On Time (Bar)', marker_color='#28a745'))
+    fig.add_trace(go.Scatter(x=month_labels, y=df['TOTAL DELIVERY ITEM'], name='Total Delivery (Line)', mode='lines+markers', line=dict(color="#ff6600", width=3, dash='dash')))
+    fig.add_trace(go.Scatter(x=month_labels, y=df['ON TIME'], name='On Time (Line)', mode='lines+markers', line=dict(color='#72e08a', width=3, dash='dash')))
+    fig.update_layout(title_text="<b>Delivery and On-Time Performance (All Years)</b>", title_font_color='black', barmode='group', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(color='black')), plot_bgcolor="#FFFFFF", paper_bgcolor="#FFFFFF", font=dict(family="Poppins, sans-serif", color='black'), hovermode='x unified', height=500, xaxis=dict(showgrid=True, gridcolor="#DDDDDD", tickfont=dict(color='black')), yaxis=dict(title_text="Jumlah (pcs)", gridcolor='#DDDDDD', tickfont=dict(color='black'), title_font_color='black'))
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def create_purchasing_figure(df):
+    """Versi go.Figure dari create_purchasing_chart (acuan)."""
+    if df.empty or 'CLOSING MONTH' not in df.columns: return json.dumps({})
+    df['CLOSING MONTH'] = pd.to_datetime(df['CLOSING MONTH'])
+    df = df.sort_values('CLOSING MONTH')
+    month_labels = df['CLOSING MONTH'].dt.strftime('%B %Y')
+    fig = go.Figure(go.Scatter(x=month_labels, y=df['Purchase Amount'], name='Purchasing Amount', mode='lines+markers', line=dict(color='#0d6efd', width=4, shape='spline'), fill='tozeroy', fillcolor='rgba(13, 110, 253, 0.2)'))
+    fig.update_layout(title_text="<b>Monthly Purchasing Amount (All Years)</b>", title_font_color='black', plot_bgcolor="#FFFFFF", paper_bgcolor="#FFFFFF", font=dict(family="Poppins, sans-serif", color='black'), yaxis_title="<b>Purchase Amount (Rp)</b>", yaxis_title_font_color='black', hovermode='x unified', height=500)
+    fig.update_yaxes(gridcolor="#DDDDDD", tickfont=dict(color='black'))
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def _normalize(value):
+    """Typed array base64 Plotly 6 ({'dtype', 'bdata'}) -> list angka biasa."""
+    if isinstance(value, dict):
+        if set(value) >= {'dtype', 'bdata'}:
+            array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+            if 'shape' in value:
+                array = array.reshape([int(n) for n in str(value['shape']).split(',')])
+            return _normalize(array.tolist())
+        return {key: _normalize(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [_normalize(val) for val in value]
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+BUILDERS = [(dashboard.create_performance_chart, create_performance_figure),
+            (dashboard.create_purchasing_chart, create_purchasing_figure)]
+
+
+@pytest.mark.parametrize('build_spec,build_figure', BUILDERS, ids=['performance', 'purchasing'])
+def test_chart_json_matches_figure(data_folder, build_spec, build_figure):
+    rollups = dashboard._get_rollups()
+    assert rollups['positions']
+    for supplier_name in rollups['positions']:
+        history = dashboard.get_supplier_rollup(supplier_name, rollups)['history']
+        spec = json.loads(build_spec(history.copy()))
+        figure = json.loads(build_figure(history.copy()))
+        assert _normalize(spec) == _normalize(figure), supplier_name
+
+
+def test_chart_json_with_missing_values():
+    history = pd.DataFrame({
+        'CLOSING MONTH': pd.to_datetime(['2021-02-28', '2021-01-31']),
+        'TOTAL DELIVERY ITEM': [10.0, np.nan],
+        'ON TIME': [9.0, 7.0],
+        'Purchase Amount': [np.nan, 1500.5],
+    })
+    for build_spec, build_figure in BUILDERS:
+        assert _normalize(json.loads(build_spec(history.copy()))) == _normalize(json.loads(build_figure(history.copy())))
+
+
+def test_empty_chart():
+    assert dashboard.create_performance_chart(pd.DataFrame()) == json.dumps({})
+    assert dashboard.create_purchasing_chart(pd.DataFrame()) == json.dumps({})
@@ -0,0 +1,40 @@
+"""Ekspor CSV/XLSX: header selalu ada dan skema ditentukan sebelum respons dimulai."""
+import io
+
+import openpyxl
+import pandas as pd
+
+import benchmark
+from conftest import SUPPLIERS, dashboard
+
+
+def _csv(client, **params):
+    response = client.get('/export', query_string=dict(format='csv', **params))
+    assert response.status_code == 200
+    return pd.read_csv(io.StringIO(response.get_data(as_text=True)))
+
+
+def test_header_is_sent_without_matching_rows(client, data_folder):
+    columns = dashboard.year_columns(dashboard.get_data_file_path(2020))
+    for params in ({'start': '2030-01'}, {'supplier': benchmark.supplier_names(SUPPLIERS)[0], 'end': '2019-12'}):
+        df = _csv(client, **params)
+        assert df.empty and list(df.columns) == columns
+
+        response = client.get('/export', query_string=dict(format='xlsx', **params))
+        rows = list(openpyxl.load_workbook(io.BytesIO(response.data)).active.values)
+        assert rows == [tuple(columns)]
+
+
+def test_year_with_unreadable_schema_is_left_out(client, data_folder, monkeypatch):
+    broken = dashboard.get_data_file_path(2020)
+    year_columns = dashboard.year_columns
+
+    def failing(file_path):
+        if file_path == broken:
+            raise OSError('unreadable')
+        return year_columns(file_path)
+
+    monkeypatch.setattr(dashboard, 'year_columns', failing)
+    df = _csv(client)
+    assert len(df) == SUPPLIERS * 12
+    assert pd.to_datetime(df['CLOSING MONTH']).dt.year.unique().tolist() == [2021]
@@ -0,0 +1,188 @@
+"""Journal perubahan Excel: replay, compaction, dan edit lintas tahun."""
+import os
+import time
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import benchmark
+from conftest import FORM, SUPPLIERS, assert_same, cold_load, dashboard, find, rehashed
+
+
+def test_journal_replay_matches_compaction(data_folder):
+    file_path = dashboard.get_data_file_path(2020)
+    before = dashboard.load_data(file_path)
+    names = benchmark.supplier_names(SUPPLIERS)
+    row_ids = before['row_id'].tolist()
+
+    dashboard.update_row(file_path, row_ids[0], {'ON TIME': 1, 'Purchase Amount': 99.5})
+    dashboard.update_row(file_path, row_ids[1], {'CLOSING MONTH': pd.Timestamp(2020, 6, 28)})
+    dashboard.delete_row(file_path, row_ids[2])
+    new_row = before.drop(columns=['row_id']).iloc[3].to_dict()
+    dashboard.append_row(file_path, dict(new_row, **{'SUPPLIER NAME': 'Journal Baru'}))
+    dashboard.append_row(file_path, dict(new_row, **{'SUPPLIER NAME': names[0], 'NOTE': 'kolom baru'}))
+
+    incremental = dashboard.load_data(file_path)
+    replayed = cold_load(file_path)
+    assert_same(incremental, replayed)
+    assert incremental['row_id'].tolist() == rehashed(incremental, 2020)
+
+    assert dashboard.compact_journal(file_path)
+    assert not os.path.exists(dashboard.get_journal_path(file_path))
+    compacted = cold_load(file_path)
+    assert_same(replayed, compacted)
+
+    # row_id lama tetap berlaku kecuali di grup yang kehilangan baris (edit bulan/hapus);
+    # baris yang hanya nilainya diubah atau mendapat duplikat di akhir grup tidak berubah
+    keys = dashboard._group_keys(before, list(range(len(before))))
+    touched = {keys[1], keys[2]}
+    untouched = {row_id for row_id, key in zip(row_ids, keys) if key not in touched}
+    assert row_ids[0] in untouched
+    assert untouched <= set(compacted['row_id'])
+
+
+def test_edit_with_mismatched_dtype_keeps_year(client):
+    file_path = dashboard.get_data_file_path(2020)
+    df = dashboard.load_data(file_path)
+    assert pd.api.types.is_integer_dtype(df['Purchase Amount'])
+    row = df.iloc[0]
+    month = pd.Timestamp(row['CLOSING MONTH']).strftime('%Y-%m')
+
+    client.post(f"/data/edit/{row['row_id']}", data=dict(FORM, month=month))
+
+    after = dashboard.load_data(file_path)
+    assert len(after) == len(df)
+    assert find(after, row['SUPPLIER NAME'], row['CLOSING MONTH'])['Purchase Amount'] == 1234.5
+    assert dashboard.compact_journal(file_path)
+    compacted = cold_load(file_path)
+    assert len(compacted) == len(df)
+    assert find(compacted, row['SUPPLIER NAME'], row['CLOSING MONTH'])['Purchase Amount'] == 1234.5
+
+
+def test_bad_journal_entry_is_rejected_and_never_compacted(data_folder):
+    file_path = dashboard.get_data_file_path(2020)
+    rows = len(dashboard.load_data(file_path))
+    with pytest.raises(Exception):
+        dashboard._journal_append(file_path, {'op': 'bogus'})
+    assert not os.path.exists(dashboard.get_journal_path(file_path))
+
+    # Entri rusak dari versi lama: dilewati pembaca, compaction menolak menulis
+    signature = dashboard._file_signature(file_path)
+    with open(dashboard.get_journal_path(file_path), 'a', encoding='utf-8') as f:
+        f.write(dashboard.json.dumps({'op': 'bogus', 'base': list(signature)}) + '\n')
+    assert len(cold_load(file_path)) == rows
+    with pytest.raises(Exception):
+        dashboard.compact_journal(file_path)
+    assert dashboard._file_signature(file_path) == signature
+    assert len(pd.read_excel(file_path)) == rows
+
+
+def test_cross_year_edit_and_delete(client):
+    name = benchmark.supplier_names(SUPPLIERS)[0]
+    source_path, target_path = dashboard.get_data_file_path(2020), dashboard.get_data_file_path(2021)
+    occupied = find(dashboard.load_data(target_path), name, '2021-03-01')
+    client.post(f"/data/delete/{occupied['row_id']}")
+    assert not dashboard.supplier_has_month(name, pd.Timestamp(2021, 3, 1))
+
+    row = find(dashboard.load_data(source_path), name, '2020-03-01')
+    rows_before = dashboard.get_supplier_stats(name)['rows']
+    client.post(f"/data/edit/{row['row_id']}", data=dict(FORM, month='2021-03'))
+
+    source, target = dashboard.load_data(source_path), dashboard.load_data(target_path)
+    assert row['row_id'] not in set(source['row_id'])
+    moved = find(target, name, '2021-03-01')
+    assert dashboard.year_from_row_id(moved['row_id']) == 2021
+    assert moved['Purchase Amount'] == 1234.5
+    assert target['row_id'].tolist() == rehashed(target, 2021)
+    assert dashboard.get_supplier_stats(name)['rows'] == rows_before
+    assert dashboard.supplier_has_month(name, pd.Timestamp(2021, 3, 1))
+    assert not dashboard.supplier_has_month(name, pd.Timestamp(2020, 3, 1))
+
+    client.post(f"/data/delete/{moved['row_id']}")
+    assert moved['row_id'] not in set(dashboard.load_data(target_path)['row_id'])
+    assert dashboard.get_supplier_stats(name)['rows'] == rows_before - 1
+    assert_same(dashboard.load_data(target_path), cold_load(target_path))
+
+
+def _edit_outside_app(file_path):
+    """Mengubah satu sel lalu menyimpan workbook, seperti pengguna Excel."""
+    wb = openpyxl.load_workbook(file_path)
+    wb.active['A2'] = 999
+    wb.save(file_path)
+
+
+def test_workbook_edited_outside_app_keeps_journal(client, data_folder, capsys):
+    file_path = dashboard.get_data_file_path(2020)
+    rows = len(dashboard.load_data(file_path))
+    client.post('/supplier/add', data=dict(FORM, month='2020-12', supplier_name='Zeta'))
+    client.post('/data/delete/' + str(find(dashboard.load_data(file_path), 'supplier 00001', '2020-01-01')['row_id']))
+    assert len(dashboard.load_data(file_path)) == rows
+    _edit_outside_app(file_path)
+
+    # Perubahan yang belum dipadatkan tetap terlihat dan peringatannya dicetak
+    df = cold_load(file_path)
+    assert 'modified outside the app' in capsys.readouterr().out
+    assert len(df) == rows and df['NO'].iloc[0] == 999
+    assert len(df[df['SUPPLIER NAME'] == 'supplier 00001']) == 11
+    assert dashboard.supplier_has_month('Zeta', pd.Timestamp(2020, 12, 1))
+    assert os.path.exists(dashboard.get_journal_path(file_path))
+
+    # Penulisan, compaction, dan upload ditolak sampai operator menyelesaikannya
+    with pytest.raises(dashboard.JournalConflictError):
+        dashboard.update_row(file_path, df['row_id'].iloc[0], {'ON TIME': 1})
+    with pytest.raises(dashboard.JournalConflictError):
+        dashboard.compact_journal(file_path)
+    with pytest.raises(dashboard.JournalConflictError):
+        dashboard.merge_year_upload(file_path, list(df.columns[:-1]), [])
+
+    runner = dashboard.app.test_cli_runner()
+    assert runner.invoke(args=['resolve-journal', 'data_2020.xlsx']).exit_code != 0
+    result = runner.invoke(args=['resolve-journal', 'data_2020.xlsx', '--apply'])
+    assert result.exit_code == 0, result.output
+    assert not os.path.exists(dashboard.get_journal_path(file_path))
+    saved = pd.read_excel(file_path)
+    assert len(saved) == rows and saved['NO'].iloc[0] == 999
+    assert dashboard.supplier_has_month('Zeta', pd.Timestamp(2020, 12, 1))
+    dashboard.update_row(file_path, cold_load(file_path)['row_id'].iloc[0], {'ON TIME': 1})
+
+
+def test_discard_moves_journal_aside(data_folder):
+    file_path = dashboard.get_data_file_path(2020)
+    rows = len(dashboard.load_data(file_path))
+    dashboard.append_row(file_path, dashboard.load_data(file_path).drop(columns=['row_id']).iloc[0].to_dict())
+    _edit_outside_app(file_path)
+    result = dashboard.app.test_cli_runner().invoke(args=['resolve-journal', 'data_2020.xlsx', '--discard'])
+    assert result.exit_code == 0, result.output
+    assert [name for name in os.listdir(data_folder) if '.discarded-' in name]
+    assert len(cold_load(file_path)) == rows
+    dashboard.append_row(file_path, dashboard.load_data(file_path).drop(columns=['row_id']).iloc[0].to_dict())
+
+
+def test_compacted_entries_are_not_orphans(data_folder):
+    # Proses berhenti setelah workbook ditulis tetapi sebelum journal dihapus
+    file_path = dashboard.get_data_file_path(2020)
+    row = dashboard.load_data(file_path).drop(columns=['row_id']).iloc[0].to_dict()
+    dashboard.append_row(file_path, row)
+    journal = open(dashboard.get_journal_path(file_path), 'rb').read()
+    dashboard.compact_journal(file_path)
+    rows = len(cold_load(file_path))
+    with open(dashboard.get_journal_path(file_path), 'wb') as f:
+        f.write(journal)
+        base = dashboard.json.loads(journal.splitlines()[0])['base']
+        f.write(dashboard.json.dumps({'op': 'compacted', 'base': base}).encode() + b"\n")
+    assert len(cold_load(file_path)) == rows
+    dashboard.append_row(file_path, row)
+    assert len(cold_load(file_path)) == rows + 1
+
+
+def test_idle_journal_is_compacted(data_folder, monkeypatch):
+    monkeypatch.setitem(dashboard.app.config, 'JOURNAL_COMPACT_IDLE_SECONDS', 0.05)
+    file_path = dashboard.get_data_file_path(2020)
+    rows = len(dashboard.load_data(file_path))
+    dashboard.append_row(file_path, dashboard.load_data(file_path).drop(columns=['row_id']).iloc[0].to_dict())
+    deadline = time.time() + 10
+    while os.path.exists(dashboard.get_journal_path(file_path)) and time.time() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(dashboard.get_journal_path(file_path))
+    assert len(pd.read_excel(file_path)) == rows + 1
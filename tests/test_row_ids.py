@@ -0,0 +1,64 @@
+"""row_id stabil: unik di dalam grup duplikat dan sama dengan hitung ulang dari nol."""
+import pandas as pd
+import pytest
+
+from conftest import _reset_state, assert_same, cold_load, dashboard, rehashed
+
+
+def test_duplicate_rows_get_distinct_stable_ids(data_folder):
+    file_path = dashboard.get_data_file_path(2020)
+    row = dashboard.load_data(file_path).drop(columns=['row_id']).iloc[0].to_dict()
+    dashboard.append_row(file_path, dict(row, **{'ON TIME': 1}))
+    dashboard.append_row(file_path, dict(row, **{'ON TIME': 2}))
+
+    df = dashboard.load_data(file_path)
+    group = df[(df['SUPPLIER NAME'] == row['SUPPLIER NAME']) & (df['CLOSING MONTH'] == row['CLOSING MONTH'])]
+    assert len(group) == 3 and group['row_id'].is_unique
+    assert df['row_id'].tolist() == rehashed(df, 2020)
+
+    # Hapus yang pertama: urutan duplikat bergeser, ID dihitung ulang seperti dari nol
+    dashboard.delete_row(file_path, group['row_id'].iloc[0])
+    df = dashboard.load_data(file_path)
+    assert df['row_id'].tolist() == rehashed(df, 2020)
+    assert [dashboard.find_row(file_path, rid)['ON TIME'] for rid in group['row_id'].iloc[:2]] == [1, 2]
+    assert_same(df, cold_load(file_path))
+
+
+@pytest.fixture
+def tiny_hashes(monkeypatch):
+    """Hash dipotong ke 97 nilai agar bentrokan row_id pasti terjadi."""
+    row_id_hashes = dashboard._row_id_hashes
+    monkeypatch.setattr(dashboard, '_row_id_hashes', lambda df: (lambda key, ids: (key, ids % 97))(*row_id_hashes(df)))
+    _reset_state()
+
+
+def test_colliding_hashes_are_probed_deterministically(tiny_hashes):
+    df = pd.DataFrame({'SUPPLIER NAME': [f's{i}' for i in range(300)],
+                       'CLOSING MONTH': pd.Timestamp(2020, 1, 1)})
+    row_ids = dashboard._assign_row_ids(df.copy(), 2020)['row_id']
+    assert row_ids.is_unique
+    shuffled = dashboard._assign_row_ids(df.sample(frac=1, random_state=1), 2020)['row_id']
+    assert shuffled.sort_index().tolist() == row_ids.tolist()
+
+
+@pytest.mark.parametrize('engine', ['excel', 'sqlite'])
+def test_colliding_row_ids_stay_unique_after_writes(data_folder, tiny_hashes, engine, monkeypatch):
+    if engine == 'sqlite':
+        result = dashboard.app.test_cli_runner().invoke(args=['storage-import'])
+        assert result.exit_code == 0, result.output
+        monkeypatch.setitem(dashboard.app.config, 'STORAGE_ENGINE', engine)
+        _reset_state()
+    file_path = dashboard.get_data_file_path(2020)
+    df = dashboard.load_data(file_path)
+    assert df['row_id'].is_unique and df['row_id'].tolist() == rehashed(df, 2020)
+
+    row = df.drop(columns=['row_id']).iloc[5].to_dict()
+    dashboard.append_row(file_path, dict(row, **{'ON TIME': 1}))
+    for position in (0, 7, 30):
+        dashboard.delete_row(file_path, dashboard.load_data(file_path)['row_id'].iloc[position])
+    dashboard.update_row(file_path, dashboard.load_data(file_path)['row_id'].iloc[3], {'SUPPLIER NAME': 'Zeta'})
+
+    df = dashboard.load_data(file_path)
+    assert df['row_id'].is_unique and df['row_id'].tolist() == rehashed(df, 2020)
+    assert dashboard.find_row(file_path, df['row_id'].iloc[3])['SUPPLIER NAME'] == 'Zeta'
+    assert_same(df, cold_load(file_path))
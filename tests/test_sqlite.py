@@ -0,0 +1,80 @@
+"""Engine SQLite harus menghasilkan data yang sama dengan engine Excel."""
+import os
+import random
+import shutil
+
+import pandas as pd
+
+import benchmark
+from conftest import FORM, SUPPLIERS, _reset_state, assert_same, dashboard, find
+
+
+def _use(folder, engine, monkeypatch):
+    monkeypatch.setattr(dashboard, 'DATA_FOLDER_PATH', folder)
+    monkeypatch.setitem(dashboard.app.config, 'STORAGE_ENGINE', engine)
+    _reset_state()
+
+
+def _run_scenario(client, folder):
+    """Tambah, edit (tahun sama dan pindah tahun), hapus, lalu upload."""
+    names = benchmark.supplier_names(SUPPLIERS)
+    client.post('/supplier/add', data=dict(FORM, month='2021-05', supplier_name='Zeta'))
+    client.post('/data/add/Zeta', data=dict(FORM, month='2021-06'))
+    df = dashboard.load_all_data()
+    client.post(f"/data/edit/{find(df, names[1], '2020-04-01')['row_id']}", data=dict(FORM, month='2020-04'))
+    client.post(f"/data/delete/{find(df, names[2], '2021-07-01')['row_id']}")
+    client.post(f"/data/edit/{find(df, names[2], '2020-07-01')['row_id']}", data=dict(FORM, month='2021-07'))
+    upload_path = os.path.join(folder, 'upload.xlsx')
+    benchmark.generate_upload(upload_path, [2020, 2021], ['Zeta', names[0]], random.Random(3))
+    with open(upload_path, 'rb') as f:
+        response = client.post('/update', data={'file': (f, 'upload.xlsx')}, content_type='multipart/form-data',
+                               headers={'Accept': 'application/json'})
+    job = benchmark.wait_for_job(client, response.get_json()['status_url'])
+    assert job['status'] == 'done', job
+    os.remove(upload_path)
+
+
+def test_sqlite_matches_excel(client, data_folder, tmp_path_factory, monkeypatch):
+    sqlite_folder = str(tmp_path_factory.mktemp('sqlite'))
+    for name in os.listdir(data_folder):
+        shutil.copy(os.path.join(data_folder, name), sqlite_folder)
+
+    _run_scenario(client, data_folder)
+    excel = {year: dashboard.load_data(dashboard.get_data_file_path(year)) for year in (2020, 2021)}
+    excel_names = dashboard.get_supplier_names()
+
+    _use(sqlite_folder, 'excel', monkeypatch)
+    result = dashboard.app.test_cli_runner().invoke(args=['storage-import'])
+    assert result.exit_code == 0, result.output
+    _use(sqlite_folder, 'sqlite', monkeypatch)
+    _run_scenario(client, sqlite_folder)
+
+    for year, df in excel.items():
+        assert_same(df, dashboard.load_data(dashboard.get_data_file_path(year)))
+    assert dashboard.get_supplier_names() == excel_names
+    assert dashboard.supplier_has_month('zeta', pd.Timestamp(2021, 6, 1))
+
+
+def test_sqlite_writes_update_cached_year(client, data_folder, monkeypatch):
+    """Penulisan satu baris memperbarui cache; load berikutnya tidak membaca ulang seluruh tahun."""
+    result = dashboard.app.test_cli_runner().invoke(args=['storage-import'])
+    assert result.exit_code == 0, result.output
+    _use(data_folder, 'sqlite', monkeypatch)
+    names = benchmark.supplier_names(SUPPLIERS)
+    dashboard.load_all_data()
+
+    full_reads = []
+    read_year = dashboard._sqlite_read_year
+    monkeypatch.setattr(dashboard, '_sqlite_read_year', lambda fp: full_reads.append(fp) or read_year(fp))
+    client.post('/supplier/add', data=dict(FORM, month='2021-05', supplier_name='Zeta'))
+    client.post('/data/add/Zeta', data=dict(FORM, month='2021-06'))
+    df = dashboard.load_all_data()
+    client.post(f"/data/edit/{find(df, names[1], '2020-04-01')['row_id']}", data=dict(FORM, month='2020-04'))
+    client.post(f"/data/delete/{find(df, names[2], '2021-07-01')['row_id']}")
+    client.post(f"/data/edit/{find(df, names[2], '2020-07-01')['row_id']}", data=dict(FORM, month='2021-07'))
+    cached = {year: dashboard.load_data(dashboard.get_data_file_path(year)) for year in (2020, 2021)}
+    assert full_reads == []
+
+    for year, df in cached.items():
+        assert_same(df, read_year(dashboard.get_data_file_path(year)))
+    assert find(cached[2021], 'Zeta', '2021-06-01')['Purchase Amount'] == 1234.5